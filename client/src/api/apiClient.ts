@@ -6,6 +6,13 @@ export interface FilterParams {
 	players: string | null;
 }
 
+// Bounds a chart's payload: the top `limit` rows, or a summary on a bins x bins grid
+export interface ChartSizeParams {
+	limit?: number;
+	downsample?: 'bin' | 'quantile';
+	bins?: number;
+}
+
 interface Response<T> {
 	data: T | null;
 	error: string | null;
@@ -40,27 +47,52 @@ async function handleApiResponse<T>(apiCall: Promise<AxiosResponse>): Promise<Re
 	}
 }
 
+// Live chart updates: a snapshot first, then a snapshot or a patch of its rows whenever the data changes
+interface LiveMessage {
+	type: 'snapshot' | 'patch';
+	version: number;
+	data?: any;
+	ops?: [number, number, any[]][];
+}
+
+function applyLiveMessage(rows: any, message: LiveMessage) {
+	if (message.type === 'snapshot') {
+		return message.data;
+	}
+
+	const updated = [...rows];
+	// the splices are in old row order, applying them from the last keeps the earlier indices valid
+	for (const [start, end, inserted] of [...(message.ops || [])].reverse()) {
+		updated.splice(start, end - start, ...inserted);
+	}
+	return updated;
+}
+
 function getRequestConfig(params: any) {
 	return Object.keys(params).length > 0 ? { params } : undefined;
 }
 
 export default {
-	getStats: async () => {
-		return handleApiResponse(apiClient.get('/stats'));
+	getStats: async (cursor: string | null = null, limit: number | null = null) => {
+		const params = { ...(cursor ? { cursor } : {}), ...(limit ? { limit } : {}) };
+		return handleApiResponse(apiClient.get('/stats', getRequestConfig(params)));
 	},
 	getPlayers: async () => {
 		return handleApiResponse(apiClient.get('/players'));
 	},
+	searchPlayers: async (query: string, limit: number = 10) => {
+		return handleApiResponse(apiClient.get('/players/search', { params: { q: query, limit } }));
+	},
 	getStatsByPlayerName: async (playerName: string) => {
 		return handleApiResponse(apiClient.get(`/stats/${playerName}`));
 	},
-	getTotalPoints: async (params: FilterParams) => {
+	getTotalPoints: async (params: FilterParams & ChartSizeParams) => {
 		return handleApiResponse(apiClient.get('/charts/total-points', getRequestConfig(params)));
 	},
-	getProduction: async (params: FilterParams) => {
+	getProduction: async (params: FilterParams & ChartSizeParams) => {
 		return handleApiResponse(apiClient.get('/charts/production', getRequestConfig(params)));
 	},
-	getShootingEfficiency: async (params: FilterParams) => {
+	getShootingEfficiency: async (params: FilterParams & ChartSizeParams) => {
 		return handleApiResponse(apiClient.get('/charts/shooting-efficiency', getRequestConfig(params)));
 	},
 	getPerGameConsistency: async (params: FilterParams) => {
@@ -69,6 +101,23 @@ export default {
 	getScoutingHeatmap: async () => {
 		return handleApiResponse(apiClient.get('/charts/scouting-heatmap'));
 	},
+	subscribeChart: (chart: string, params: FilterParams & ChartSizeParams, onData: (response: any) => void) => {
+		const query = new URLSearchParams(
+			Object.entries(params)
+				.filter(([, value]) => value !== null && value !== undefined)
+				.map(([key, value]) => [key, String(value)])
+		);
+		const source = new EventSource(`${apiClient.defaults.baseURL}/live/charts/${chart}?${query}`);
+
+		let rows: any = null;
+		source.onmessage = (event) => {
+			rows = applyLiveMessage(rows, JSON.parse(event.data));
+			onData({ data: mapKeysToCamelCase(rows) });
+		};
+
+		// call to unsubscribe
+		return () => source.close();
+	},
 	getHeadToHead: async (params: FilterParams) => {
 		return handleApiResponse(apiClient.get('/charts/head-to-head', getRequestConfig(params)));
 	},
@@ -1,12 +1,7 @@
 import { defineStore } from "pinia";
-import { ref } from "vue";
-import apiClient, { type FilterParams } from "@api/apiClient.ts";
+import type { FilterParams } from "@api/apiClient.ts";
 import type { FilterableChartType } from "@components/BaseChart.vue";
 
-interface PlayersResponse {
-	data: string[];
-}
-
 export const initialFilters: FilterParams = {
 	season: 2025,
 	players: null
@@ -50,40 +45,6 @@ export const useSettingsStore = defineStore('settings', {
 	}
 });
 
-export const usePlayersStore = defineStore('players', () => {
-	const players = ref<string[]>([]);
-	const isLoaded = ref(false);
-
-	const fetchPlayers = async () => {
-		// If already loaded, return cached data
-		if (isLoaded.value) {
-			return players.value;
-		}
-
-		const response = await apiClient.getPlayers();
-
-		if (response.data) {
-			const responseData = response.data as PlayersResponse;
-			players.value = Array.isArray(responseData.data) ? responseData.data : [];
-			isLoaded.value = true;
-		}
-
-		return players.value;
-	};
-
-	const clearCache = () => {
-		players.value = [];
-		isLoaded.value = false;
-	};
-
-	return {
-		players,
-		isLoaded,
-		fetchPlayers,
-		clearCache
-	};
-});
-
 export const useFiltersStore = defineStore('filters', {
 	// Allows the user to navigate to different charts and retain the latest filter settings for each one
 	state: () => ({
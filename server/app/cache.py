@@ -0,0 +1,153 @@
+import inspect
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Hashable, Iterable, List, Optional, Tuple
+
+from app import settings
+
+# (season, players) an entry was computed for, None meaning "all seasons" / "all players"
+Scope = Tuple[Optional[int], Optional[frozenset]]
+
+
+class QueryCache:
+    """
+    LRU cache of StatsService results.
+    The data only changes when we ingest, so entries live until the data version moves,
+    or, for a delta, until a change touches their season or players.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.data_version = 0
+        # The database's generation token, versions only compare within one generation
+        self.generation = ''
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Called with the new version whenever it moves, e.g. to push fresh results to live subscribers
+        self.listeners: List[Callable[[int], None]] = []
+
+    def get(self, key: Hashable) -> Any:
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def set(self, key: Hashable, value: Any, state: Tuple[str, int], scope: Scope = (None, None)) -> None:
+        # A result computed before the last bump may already be stale, so it is dropped
+        if state != self.state or self.max_entries <= 0:
+            return
+
+        self.entries[key] = (value, scope)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def state(self) -> Tuple[str, int]:
+        # What in-process copies of the data (columns, search index, live topics) are current for
+        return self.generation, self.data_version
+
+    def sync_version(self, version: int, generation: str) -> None:
+        # The version lives in the database (see app.coordination), this process follows it
+        if (generation, version) != self.state:
+            self.generation = generation
+            self.data_version = version
+            self.entries.clear()
+            self.notify()
+
+    def invalidate(self, version: int, seasons: Iterable[int], players: Iterable[str]) -> None:
+        """
+        Moves to a version produced by a delta, evicting only the entries whose scope
+        overlaps the changed seasons and players. Everything else stays cached.
+        """
+        if version == self.data_version:
+            return
+
+        seasons = set(seasons)
+        players = set(players)
+
+        def affected(scope: Scope) -> bool:
+            season, scope_players = scope
+            return (season is None or season in seasons) and (scope_players is None or not scope_players.isdisjoint(players))
+
+        stale = [key for key, (_, scope) in self.entries.items() if affected(scope)]
+        for key in stale:
+            del self.entries[key]
+
+        self.invalidations += len(stale)
+        self.data_version = version
+        self.notify()
+
+    def notify(self) -> None:
+        for listener in self.listeners:
+            listener(self.data_version)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "data_version": self.data_version,
+            "generation": self.generation,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+query_cache = QueryCache(settings.QUERY_CACHE_MAX_ENTRIES)
+
+
+def normalize(value: Any, unordered: bool) -> Hashable:
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(value)) if unordered else tuple(value)
+    return value
+
+
+def cached(unordered: Iterable[str] = ()):
+    """
+    Caches an async service method on its name and normalized arguments.
+    Arguments named in `unordered` are sorted, so ["A", "B"] and ["B", "A"] share an entry.
+    The `season` and `player_list` arguments, where a method has them, scope the entry for
+    QueryCache.invalidate.
+    """
+    unordered = set(unordered)
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+
+            key = (method.__qualname__,) + tuple(
+                (name, normalize(value, name in unordered))
+                for name, value in bound.arguments.items()
+                if name != 'self'
+            )
+
+            result = query_cache.get(key)
+            if result is not None:
+                return result
+
+            player_list = bound.arguments.get('player_list')
+            scope = (bound.arguments.get('season') or None, frozenset(player_list) if player_list else None)
+
+            state = query_cache.state
+            result = await method(self, *args, **kwargs)
+            query_cache.set(key, result, state, scope)
+            return result
+
+        return wrapper
+
+    return decorator
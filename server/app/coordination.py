@@ -0,0 +1,120 @@
+import asyncio
+import fcntl
+import secrets
+from contextlib import asynccontextmanager
+from typing import Tuple
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.cache import query_cache
+from app.models import DataVersion, StatsChange, StatsChangeSet
+
+# Postgres advisory lock keys, arbitrary but fixed for the app
+STARTUP_LOCK = 72_001
+SNAPSHOT_LOCK = 72_002
+PREWARM_LOCK = 72_003
+
+
+@asynccontextmanager
+async def advisory_lock(engine: AsyncEngine, key: int, blocking: bool = True):
+    """
+    Serializes a block across every process sharing the database, e.g. all workers starting at once.
+    Postgres takes an advisory lock; a SQLite database is only shared on one host, so a lock file
+    next to it does the same. An in-memory database isn't shared at all, the block just runs.
+
+    Yields whether the lock is held. With blocking=False it isn't waited for: the block runs
+    at once, told False if another process holds it.
+    """
+    if engine.dialect.name != 'postgresql':
+        database = engine.url.database
+        if not database or database == ':memory:':
+            yield True
+            return
+
+        with open(f"{database}.{key}.lock", 'a') as lock_file:
+            try:
+                # flock blocks until the holder is done, off the event loop
+                await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+
+    async with engine.connect() as conn:
+        if blocking:
+            await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+        elif not (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key})).scalar_one():
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+
+
+def new_generation() -> str:
+    return secrets.token_hex(8)
+
+
+async def ensure_data_version(conn: AsyncConnection) -> None:
+    if (await conn.execute(select(DataVersion.version))).first() is None:
+        await conn.execute(DataVersion.__table__.insert().values(id=1, version=0, generation=new_generation()))
+
+
+async def bump_data_version(conn: AsyncConnection) -> int:
+    # Runs in the writer's transaction, so readers never see the new version before the new data
+    await conn.execute(update(DataVersion).values(version=DataVersion.version + 1))
+    return (await conn.execute(select(DataVersion.version))).scalar_one()
+
+
+async def read_data_version(engine: AsyncEngine) -> Tuple[int, str]:
+    async with engine.connect() as conn:
+        return tuple((await conn.execute(select(DataVersion.version, DataVersion.generation))).one())
+
+
+async def follow_data_version(engine: AsyncEngine) -> None:
+    """
+    Catches this process's cache up with the database. When every version since ours came from
+    a delta, only the entries for the changed seasons and players go; otherwise the cache is cleared,
+    as it is when the database was recreated or restored (a new generation).
+    """
+    current = query_cache.data_version
+
+    async with engine.connect() as conn:
+        version, generation = (await conn.execute(select(DataVersion.version, DataVersion.generation))).one()
+        if generation != query_cache.generation:
+            query_cache.sync_version(version, generation)
+            return
+        if version == current:
+            return
+
+        newer = StatsChangeSet.version > current
+        deltas = (await conn.execute(select(func.count()).where(newer, StatsChangeSet.version <= version))).scalar_one()
+        if version < current or deltas != version - current:
+            query_cache.sync_version(version, generation)
+            return
+
+        changed = StatsChange.version > current
+        seasons = (await conn.execute(select(StatsChange.season).where(changed).distinct())).scalars().all()
+        players = (await conn.execute(select(StatsChange.player_name).where(changed).distinct())).scalars().all()
+
+    query_cache.invalidate(version, seasons, players)
+
+
+async def poll_data_version(engine: AsyncEngine, interval: float) -> None:
+    """
+    Keeps this process's data version (and so its caches and ETags) in step with writes made
+    by other processes: other workers, or the ingest CLI.
+    """
+    while True:
+        try:
+            await follow_data_version(engine)
+        except Exception:
+            # a failed poll is retried on the next tick, the caches just stay as they are meanwhile
+            pass
+        await asyncio.sleep(interval)
@@ -1,90 +1,183 @@
-import csv
-from pathlib import Path
-from typing import Optional, AsyncGenerator
+from typing import Dict, Optional, AsyncGenerator, Tuple
 
-from sqlalchemy import AsyncAdaptedQueuePool
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
-from sqlmodel import SQLModel, select, func
+from sqlmodel import SQLModel, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import settings
+from app.cache import query_cache
+from app.coordination import STARTUP_LOCK, advisory_lock, ensure_data_version, read_data_version
+from app.ingest import ingest_csv
+from app.metrics import InstrumentedQueuePool
+from app.migrations import schema_is_current, upgrade
+from app.summaries import refresh_summaries
 
 # Models to register with SQLModel.metadata
-from app.models import Stats
+from app.models import Stats, SummaryRefresh
+
+
+def pool_options() -> dict:
+    return dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
+def create_postgres_engine(host: str, port: str) -> AsyncEngine:
+    database_url = (
+        f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}"
+        f"@{host}:{port}/{settings.DB_NAME}"
+        # SQLAlchemy's own cache of asyncpg prepared statements
+        f"?prepared_statement_cache_size={settings.DB_STATEMENT_CACHE_SIZE}"
+    )
+
+    return create_async_engine(
+        database_url,
+        **pool_options(),
+        # asyncpg's statement cache, so repeated chart queries skip the parse/plan round-trip
+        connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+
+
+def create_sqlite_engine(path: str) -> AsyncEngine:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", **pool_options())
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, _):
+        # WAL lets chart reads run while an ingest writes; writers wait for each other instead of failing
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.DB_POOL_TIMEOUT * 1000}")
+        cursor.close()
+
+    return engine
+
+
+def postgres_engines() -> Tuple[AsyncEngine, AsyncEngine]:
+    primary = create_postgres_engine(settings.DB_HOST, settings.DB_PORT)
+    if not settings.DB_REPLICA_HOST:
+        return primary, primary
+
+    return primary, create_postgres_engine(settings.DB_REPLICA_HOST, settings.DB_REPLICA_PORT)
+
+
+def sqlite_engines() -> Tuple[AsyncEngine, AsyncEngine]:
+    # One file, so one engine; WAL already keeps reads off the writer's lock
+    engine = create_sqlite_engine(settings.DB_SQLITE_PATH)
+    return engine, engine
+
+
+# DB_BACKEND -> builds the (write, read) engines
+BACKENDS = {
+    "postgres": postgres_engines,
+    "sqlite": sqlite_engines,
+}
+
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(
+        engine,
+        expire_on_commit=False,
+        autoflush=False,
+        class_=AsyncSession
+    )
 
 
 class SessionManager:
+    """
+    Holds the write engine (ingestion, schema, summaries) and the read engine that request
+    sessions use. They are the same engine unless a read replica is configured.
+    """
+
     def __init__(self) -> None:
         self.engine: Optional[AsyncEngine] = None
+        self.read_engine: Optional[AsyncEngine] = None
         self.session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+        self.read_session_factory: Optional[async_sessionmaker[AsyncSession]] = None
 
-    async def init_db(self) -> None:
-        database_url = (
-            f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}"
-            f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
-        )
-
-        self.engine = create_async_engine(
-            database_url,
-            poolclass=AsyncAdaptedQueuePool,
-            pool_pre_ping=True,
-        )
-
-        self.session_factory = async_sessionmaker(
-            self.engine,
-            expire_on_commit=False,
-            autoflush=False,
-            class_=AsyncSession
-        )
+    def connect(self) -> None:
+        # Only builds the engines, for tools that must run before the schema is brought up to date
+        if settings.DB_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown DB_BACKEND {settings.DB_BACKEND!r}, expected one of: {', '.join(BACKENDS)}")
 
-        async with self.engine.begin() as conn:
-            await conn.run_sync(SQLModel.metadata.create_all)
+        self.engine, self.read_engine = BACKENDS[settings.DB_BACKEND]()
+        self.session_factory = create_session_factory(self.engine)
+        self.read_session_factory = create_session_factory(self.read_engine)
+
+    async def init_db(self, seed: bool = True) -> None:
+        self.connect()
 
-        await self.load_initial_data()
+        try:
+            # A schema at the newest migration needs neither create_all nor the startup lock
+            schema_current = await schema_is_current(self.engine)
+
+            # With several workers starting together, only one creates the schema and seeds at a time
+            if not schema_current or seed:
+                async with advisory_lock(self.engine, STARTUP_LOCK):
+                    if not schema_current:
+                        await self.create_schema()
+                    if seed:
+                        await self.load_initial_data()
+
+            # Caches follow the version the read engine sees, a replica may not have the latest writes yet
+            query_cache.sync_version(*await read_data_version(self.read_engine))
+        except BaseException:
+            # e.g. a migration refusing to run; open SQLite connections would keep the process from exiting
+            await self.close_db()
+            raise
+
+    def pools(self) -> Dict[str, InstrumentedQueuePool]:
+        # By role; without a read replica both roles share one pool, reported once as 'shared'
+        if self.engine is None:
+            return {}
+        if self.read_engine is self.engine:
+            return {"shared": self.engine.pool}
+        return {"write": self.engine.pool, "read": self.read_engine.pool}
 
     async def close_db(self) -> None:
+        if self.read_engine and self.read_engine is not self.engine:
+            await self.read_engine.dispose()
         if self.engine:
             await self.engine.dispose()
 
+    async def create_schema(self) -> None:
+        async with self.engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        await upgrade(self.engine)
+        # After the migrations, which add the generation column to an older DataVersion table
+        async with self.engine.begin() as conn:
+            await ensure_data_version(conn)
+
     async def load_initial_data(self) -> None:
+        # Only asks whether any row exists, a COUNT(*) would scan the whole table
         async with self.session_factory() as session:
-            result = await session.exec(select(func.count()).select_from(Stats))
-            count = result.first()
-
-            if count == 0:
-                # Table is empty, load data from CSV
-                csv_file_path = Path(__file__).parent.parent / 'data' / 'stats.csv'
-
-                with open(csv_file_path, 'r') as csvfile:
-                    csv_reader = csv.DictReader(csvfile)
-                    for row in csv_reader:
-                        # example "100:50" , "minutes:seconds", convert to total seconds
-                        toi_parts = row['toi'].rstrip('.').split(':')
-                        toi_seconds = int(toi_parts[0]) * 60 + int(toi_parts[1])
-
-                        stat = Stats(
-                            season=int(row['season']),
-                            player_name=row['player_name'],
-                            team=row['team'],
-                            gp=int(row['gp']),
-                            toi=toi_seconds,
-                            shots=int(row['shots']),
-                            goals=int(row['goals']),
-                            assists=int(row['assists']),
-                            points=int(row['points']),
-                            scouting_grade=int(row['scouting_grade'])
-                        )
-                        session.add(stat)
-
-                await session.commit()
+            result = await session.exec(select(Stats.id).limit(1))
+            empty = result.first() is None
+
+            result = await session.exec(select(SummaryRefresh.summary).limit(1))
+            summaries_built = result.first() is not None
+
+        if empty:
+            # Table is empty, load data from CSV
+            await ingest_csv(self.engine, read_engine=self.read_engine)
+        elif not summaries_built:
+            # Data predates the summary tables, build them once
+            async with self.engine.begin() as conn:
+                await refresh_summaries(conn)
 
 
 session_manager = SessionManager()
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    if not session_manager.session_factory:
+    # Request sessions only read, so they go to the read engine
+    if not session_manager.read_session_factory:
         raise RuntimeError("Database session factory is not initialized.")
-    async with session_manager.session_factory() as session:
+    async with session_manager.read_session_factory() as session:
         try:
             yield session
         finally:
@@ -0,0 +1,80 @@
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, case, cast, func
+
+# The y quantiles reported for every x bin in 'quantile' mode
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+DOWNSAMPLE_MODES = ('bin', 'quantile')
+
+
+def axis_bins(lo: float, hi: float, bins: int) -> Tuple[float, float]:
+    # (start, width) of `bins` equal bins over [lo, hi]; a constant axis still gets a bin
+    return float(lo), float(hi - lo) / bins if hi > lo else 1.0
+
+
+def bin_of(values: np.ndarray, start: float, width: float, bins: int) -> np.ndarray:
+    # The axis maximum falls on the upper edge of the last bin, so it is clamped into it
+    return np.minimum(np.floor((values - start) / width).astype(np.int64), bins - 1)
+
+
+def bin_expression(column, start: float, width: float, bins: int):
+    # SQL counterpart of bin_of, so both engines put a row in the same cell
+    index = func.floor((column - start) / width)
+    return cast(case((index >= bins, bins - 1), else_=index), Integer)
+
+
+def bin_cells(x_bins, y_bins, counts, x_axis: Tuple[float, float], y_axis: Tuple[float, float]) -> List[dict]:
+    (x_start, x_width), (y_start, y_width) = x_axis, y_axis
+    return [
+        {
+            "x0": round(x_start + i * x_width, 4),
+            "x1": round(x_start + (i + 1) * x_width, 4),
+            "y0": round(y_start + j * y_width, 4),
+            "y1": round(y_start + (j + 1) * y_width, 4),
+            "count": count,
+        }
+        for i, j, count in zip(x_bins, y_bins, counts)
+    ]
+
+
+def bin_summary(x: np.ndarray, y: np.ndarray, bins: int) -> List[dict]:
+    """
+    Counts the points in every non-empty cell of a bins x bins grid over the data's extent,
+    in x then y order.
+    """
+    if not len(x):
+        return []
+
+    x_axis = axis_bins(x.min(), x.max(), bins)
+    y_axis = axis_bins(y.min(), y.max(), bins)
+    cells, counts = np.unique(bin_of(x, *x_axis, bins) * bins + bin_of(y, *y_axis, bins), return_counts=True)
+
+    return bin_cells((cells // bins).tolist(), (cells % bins).tolist(), counts.tolist(), x_axis, y_axis)
+
+
+def quantile_summary(x: np.ndarray, y: np.ndarray, bins: int) -> List[dict]:
+    """
+    Splits x into equal bins and summarizes y in every non-empty one by its QUANTILES,
+    which keeps the shape of the distribution a grid of counts flattens.
+    """
+    if not len(x):
+        return []
+
+    start, width = axis_bins(x.min(), x.max(), bins)
+    index = bin_of(x, start, width, bins)
+    order = np.argsort(index, kind='stable')
+    groups, offsets, counts = np.unique(index[order], return_index=True, return_counts=True)
+
+    summary = []
+    for i, offset, count in zip(groups.tolist(), offsets.tolist(), counts.tolist()):
+        values = np.quantile(y[order[offset:offset + count]], QUANTILES)
+        summary.append({
+            "x0": round(start + i * width, 4),
+            "x1": round(start + (i + 1) * width, 4),
+            "count": count,
+            **{f"p{round(q * 100)}": round(float(value), 4) for q, value in zip(QUANTILES, values)},
+        })
+
+    return summary
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import settings
+from app.cache import query_cache
+from app.coordination import SNAPSHOT_LOCK, advisory_lock
+from app.models import Stats
+
+COLUMNS = [
+    'id',
+    'season',
+    'player_name',
+    'team',
+    'gp',
+    'toi',
+    'shots',
+    'goals',
+    'assists',
+    'points',
+    'scouting_grade',
+    'toi_per_game',
+    'goals_per_game',
+    'assists_per_game',
+    'points_per_game',
+    'shots_per_game',
+    'shooting_percentage',
+    'shooting_efficiency',
+]
+
+
+class ColumnarStore:
+    """
+    The whole 'Stats' table held as one NumPy array per column, in id order.
+    It is reloaded when the data version moves, so it is never staler than the query cache.
+
+    With SNAPSHOT_DIR set, the columns are shared between worker processes: the first worker to
+    need a version loads it from the database and writes it out as .npy files, the others memory-map
+    those files, so the table is read from the database once and the pages are shared.
+    """
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, np.ndarray] = {}
+        self.state: Optional[Tuple[str, int]] = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_current(self) -> bool:
+        return self.state == query_cache.state
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self.is_current:
+            return
+
+        async with self.lock:
+            if self.is_current:
+                return
+
+            state = query_cache.state
+
+            if settings.SNAPSHOT_DIR:
+                async with advisory_lock(db.bind, SNAPSHOT_LOCK):
+                    if not self.load_snapshot(state):
+                        await self.load(db)
+                        self.save_snapshot(state)
+            else:
+                await self.load(db)
+
+            self.state = state
+
+    async def load(self, db: AsyncSession) -> None:
+        query = select(*[getattr(Stats, name) for name in COLUMNS]).order_by(Stats.id)
+        result = await db.exec(query)
+        rows = result.all()
+
+        if rows:
+            self.columns = {name: np.array(values) for name, values in zip(COLUMNS, zip(*rows))}
+        else:
+            self.columns = {name: np.array([]) for name in COLUMNS}
+
+    def snapshot_path(self, state: Tuple[str, int]) -> Path:
+        # Named by generation too, a recreated database's version 1 is not the old one's
+        generation, version = state
+        return Path(settings.SNAPSHOT_DIR) / f"v{version}-{generation}"
+
+    def load_snapshot(self, state: Tuple[str, int]) -> bool:
+        path = self.snapshot_path(state)
+        if not path.is_dir():
+            return False
+
+        self.columns = {name: np.load(path / f"{name}.npy", mmap_mode='r') for name in COLUMNS}
+        return True
+
+    def save_snapshot(self, state: Tuple[str, int]) -> None:
+        path = self.snapshot_path(state)
+        staging = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        staging.mkdir(parents=True, exist_ok=True)
+
+        for name in COLUMNS:
+            np.save(staging / f"{name}.npy", self.columns[name])
+        # the rename publishes the snapshot in one step, readers never see a partial one
+        staging.rename(path)
+
+        # older versions are no longer read; workers still mapping them keep their pages until they reload
+        for old in path.parent.glob('v*'):
+            if old != path and old.is_dir():
+                shutil.rmtree(old, ignore_errors=True)
+
+    def mask(self, season: int = None, player_list: List[str] = None) -> np.ndarray:
+        # Same filters as service.build_query
+        selected = np.ones(len(self.columns['id']), dtype=bool)
+        if season:
+            selected &= self.columns['season'] == season
+        if player_list:
+            selected &= np.isin(self.columns['player_name'], player_list)
+
+        return selected
+
+    def records(self, index: np.ndarray, fields: List[str]) -> List[dict]:
+        values = [self.columns[name][index].tolist() for name in fields]
+        return [dict(zip(fields, row)) for row in zip(*values)]
+
+    def sorted_desc(self, selected: np.ndarray, key: str) -> np.ndarray:
+        index = np.flatnonzero(selected)
+        # stable, so ties keep id order
+        order = np.argsort(-self.columns[key][index], kind='stable')
+        return index[order]
+
+
+columnar_store = ColumnarStore()
@@ -0,0 +1,164 @@
+import asyncio
+import io
+from typing import AsyncIterator, List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import settings
+from app.models import TEAM_MAPPING, Stats
+from app.service import StatsService
+
+# Arrow type of every exportable column: the StatsExtended fields plus shooting_efficiency.
+# team_full_name is filled in from TEAM_MAPPING.
+EXPORT_TYPES = {
+    "id": pa.int64(),
+    "season": pa.int32(),
+    "player_name": pa.string(),
+    "team": pa.string(),
+    "team_full_name": pa.string(),
+    "gp": pa.int32(),
+    "toi": pa.float64(),
+    "toi_per_game": pa.float64(),
+    "shots": pa.int32(),
+    "shots_per_game": pa.float64(),
+    "shooting_percentage": pa.float64(),
+    "shooting_efficiency": pa.float64(),
+    "goals": pa.int32(),
+    "goals_per_game": pa.float64(),
+    "assists": pa.int32(),
+    "assists_per_game": pa.float64(),
+    "points": pa.int32(),
+    "points_per_game": pa.float64(),
+    "scouting_grade": pa.int32(),
+}
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ChunkedSink(io.RawIOBase):
+    """
+    Write target for the Arrow and Parquet writers whose bytes are drained into the response
+    after every batch. tell() keeps counting across drains, Parquet's footer offsets rely on it.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_schema(fields: List[str]) -> pa.Schema:
+    return pa.schema([(name, EXPORT_TYPES[name]) for name in fields])
+
+
+def query_columns(fields: List[str]) -> List:
+    # The Stats columns to select for the export fields, id is always selected first by the service
+    names = [name for name in fields if name not in ('id', 'team_full_name')]
+    if 'team_full_name' in fields and 'team' not in names:
+        names.append('team')
+    return [getattr(Stats, name) for name in names]
+
+
+def to_record_batch(rows: List, columns: List, schema: pa.Schema) -> pa.RecordBatch:
+    values = dict(zip(['id'] + [column.key for column in columns], zip(*rows)))
+    if 'team_full_name' in schema.names:
+        values['team_full_name'] = [TEAM_MAPPING.get(team, "Unknown Team") for team in values['team']]
+
+    return pa.record_batch([pa.array(values[field.name], type=field.type) for field in schema], schema=schema)
+
+
+def export_fields(format: str, columns: str = None) -> List[str]:
+    # Validates an export request, columns is a comma separated list (all of them when empty)
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format, expected one of: {', '.join(EXPORT_FORMATS)}.")
+
+    fields = columns.split(',') if columns else list(EXPORT_TYPES)
+    unknown = [name for name in fields if name not in EXPORT_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}.")
+
+    return fields
+
+
+def open_writer(format: str, sink: ChunkedSink, schema: pa.Schema):
+    if format == 'parquet':
+        return pq.ParquetWriter(sink, schema, compression='zstd')
+    return pa.ipc.new_stream(sink, schema)
+
+
+async def stream_export(
+        session_factory: async_sessionmaker,
+        format: str,
+        fields: List[str],
+        season: int = None,
+        player_list: List[str] = None,
+        batch_size: int = settings.EXPORT_BATCH_SIZE,
+) -> AsyncIterator[bytes]:
+    """
+    Streams the filtered 'Stats' rows as an Arrow IPC stream or a Parquet file, one record batch
+    (Parquet row group) per page, so memory is bounded by the batch and not by the export.
+    """
+    schema = export_schema(fields)
+    columns = query_columns(fields)
+    sink = ChunkedSink()
+    writer = open_writer(format, sink, schema)
+
+    # Streaming outlives the request-scoped session, so it opens its own
+    async with session_factory() as session:
+        stats_service = StatsService(session)
+        async for page in stats_service.iter_filtered_stats(columns, season, player_list, batch_size):
+            # Encoding (and Parquet's compression) runs off the event loop, pyarrow releases the GIL
+            await asyncio.to_thread(writer.write_batch, to_record_batch(page, columns, schema))
+            yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+async def export_bytes(
+        session_factory: async_sessionmaker,
+        format: str,
+        fields: List[str],
+        season: int = None,
+        player_list: List[str] = None,
+        max_bytes: int = settings.JOB_MAX_RESULT_BYTES,
+) -> bytes:
+    """
+    The whole export at once, for background jobs that keep it until it is fetched. Stops as soon
+    as it grows past max_bytes, rather than building an export too large to keep.
+    """
+    chunks = []
+    size = 0
+    stream = stream_export(session_factory, format, fields, season, player_list)
+    try:
+        async for chunk in stream:
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"The export is larger than {max_bytes} bytes, narrow it with season, players or columns.")
+            chunks.append(chunk)
+    finally:
+        await stream.aclose()
+
+    return b''.join(chunks)
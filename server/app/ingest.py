@@ -0,0 +1,293 @@
+import csv
+import itertools
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app import settings
+from app.coordination import bump_data_version, follow_data_version
+from app.models import Stats, StatsChange, StatsChangeSet
+from app.summaries import KEY_CHUNK_SIZE, chunks, refresh_summaries
+
+DEFAULT_CSV_PATH = Path(__file__).parent.parent / 'data' / 'stats.csv'
+
+# Columns as they appear in the CSV feed and in the 'Stats' table
+STATS_COLUMNS = [
+    'season',
+    'player_name',
+    'team',
+    'gp',
+    'toi',
+    'shots',
+    'goals',
+    'assists',
+    'points',
+    'scouting_grade',
+]
+INT_COLUMNS = ['season', 'gp', 'shots', 'goals', 'assists', 'points', 'scouting_grade']
+
+# Stored alongside the source columns so reads never recompute them
+DERIVED_COLUMNS = [
+    'toi_per_game',
+    'goals_per_game',
+    'assists_per_game',
+    'points_per_game',
+    'shots_per_game',
+    'shooting_percentage',
+    'shooting_efficiency',
+]
+INSERT_COLUMNS = STATS_COLUMNS + DERIVED_COLUMNS
+
+# A row is identified by (season, player_name, team), re-ingesting the same feed updates in place
+CONFLICT_COLUMNS = ['season', 'player_name', 'team']
+
+
+@dataclass
+class IngestResult:
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class DeltaResult:
+    version: int
+    inserted: int
+    updated: int
+    seasons: List[int]
+    players: List[str]
+    seconds: float
+
+
+def parse_toi(values: np.ndarray) -> np.ndarray:
+    # example "100:50" or "100:50.", "minutes:seconds", convert to total seconds
+    parts = np.char.partition(np.char.rstrip(values, '.'), ':')
+    return parts[:, 0].astype(np.int64) * 60 + parts[:, 2].astype(np.int64)
+
+
+def ratio(numerator: np.ndarray, denominator: np.ndarray, decimals: int, scale: float = 1.0) -> np.ndarray:
+    # 0.0 where the denominator is 0, matching how the API has always reported empty ratios
+    values = np.divide(numerator, denominator, out=np.zeros(len(numerator)), where=denominator > 0) * scale
+    # Divided, scaled, then rounded with Python's round, exactly as the values were computed before;
+    # np.round scales by 10**decimals first and lands differently on some halves
+    return np.array([round(value, decimals) for value in values.tolist()], dtype=np.float64)
+
+
+def derive_metrics(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    gp = columns['gp']
+    shots = columns['shots']
+
+    return {
+        'toi_per_game': ratio(columns['toi'], gp, 2),
+        'goals_per_game': ratio(columns['goals'], gp, 2),
+        'assists_per_game': ratio(columns['assists'], gp, 2),
+        'points_per_game': ratio(columns['points'], gp, 2),
+        'shots_per_game': ratio(shots, gp, 2),
+        'shooting_percentage': ratio(columns['goals'], shots, 1, scale=100.0),
+        'shooting_efficiency': ratio(columns['goals'], shots, 4),
+    }
+
+
+def rows_to_columns(header: List[str], rows: List[List[str]]) -> Dict[str, np.ndarray]:
+    raw = dict(zip(header, (np.array(values) for values in zip(*rows))))
+
+    columns = {name: raw[name] for name in ('player_name', 'team')}
+    for name in INT_COLUMNS:
+        columns[name] = raw[name].astype(np.int64)
+    columns['toi'] = parse_toi(raw['toi'])
+    columns.update(derive_metrics(columns))
+
+    return columns
+
+
+def read_rows(rows: List[Dict]) -> Dict[str, np.ndarray]:
+    # Rows as decoded from JSON, toi still in the feed's "minutes:seconds" format
+    if not rows:
+        raise ValueError("The delta has no rows.")
+    return rows_to_columns(STATS_COLUMNS, [[str(row[name]) for name in STATS_COLUMNS] for row in rows])
+
+
+def read_batches(path: Path, batch_size: int) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Streams the CSV in column-oriented batches of at most batch_size rows,
+    so memory is bounded by the batch and not by the file.
+    """
+    with open(path, 'r', newline='') as csvfile:
+        csv_reader = csv.reader(csvfile)
+        header = next(csv_reader)
+
+        while True:
+            rows = list(itertools.islice(csv_reader, batch_size))
+            if not rows:
+                break
+            yield rows_to_columns(header, rows)
+
+
+def columns_to_records(columns: Dict[str, np.ndarray]) -> List[tuple]:
+    records = zip(*(columns[name].tolist() for name in INSERT_COLUMNS))
+
+    # Later duplicates of a key win, a single upsert statement can't touch the same row twice
+    key_indexes = [INSERT_COLUMNS.index(name) for name in CONFLICT_COLUMNS]
+    deduped = {tuple(record[i] for i in key_indexes): record for record in records}
+
+    return list(deduped.values())
+
+
+async def copy_upsert(conn: AsyncConnection, records: List[tuple]) -> None:
+    # asyncpg: COPY into a transaction-scoped staging table, then one INSERT ... ON CONFLICT
+    table = Stats.__tablename__
+    column_list = ', '.join(INSERT_COLUMNS)
+    updates = ', '.join(f"{name} = EXCLUDED.{name}" for name in INSERT_COLUMNS if name not in CONFLICT_COLUMNS)
+
+    raw_connection = await conn.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    await conn.execute(text(
+        f"CREATE TEMP TABLE {table}_staging ON COMMIT DROP AS "
+        f"SELECT {column_list} FROM {table} WITH NO DATA"
+    ))
+    await driver_connection.copy_records_to_table(
+        f"{table}_staging",
+        records=records,
+        columns=INSERT_COLUMNS,
+    )
+    await conn.execute(text(
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {table}_staging "
+        f"ON CONFLICT ({', '.join(CONFLICT_COLUMNS)}) DO UPDATE SET {updates}"
+    ))
+
+
+async def executemany_upsert(conn: AsyncConnection, records: List[tuple]) -> None:
+    insert = postgresql_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+
+    statement = insert(Stats.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=CONFLICT_COLUMNS,
+        set_={name: statement.excluded[name] for name in INSERT_COLUMNS if name not in CONFLICT_COLUMNS},
+    )
+
+    await conn.execute(statement, [dict(zip(INSERT_COLUMNS, record)) for record in records])
+
+
+async def write_batch(conn: AsyncConnection, records: List[tuple]) -> None:
+    if conn.dialect.driver == 'asyncpg':
+        await copy_upsert(conn, records)
+    else:
+        await executemany_upsert(conn, records)
+
+
+async def ingest_csv(
+        engine: AsyncEngine,
+        path: Path = DEFAULT_CSV_PATH,
+        batch_size: int = settings.INGEST_BATCH_SIZE,
+        on_batch: Optional[Callable[[IngestResult], None]] = None,
+        read_engine: Optional[AsyncEngine] = None,
+) -> IngestResult:
+    """
+    Loads a stats CSV in bounded batches, each upserted and committed in its own transaction.
+    The summary tables are then refreshed once, for the seasons and players the file touched.
+    on_batch is called with the running totals after every batch.
+    This process's caches then follow the data version seen by read_engine (default: engine).
+    """
+    start = time.perf_counter()
+    total = 0
+    seasons = set()
+    players = set()
+
+    for columns in read_batches(path, batch_size):
+        records = columns_to_records(columns)
+
+        async with engine.begin() as conn:
+            await write_batch(conn, records)
+            await bump_data_version(conn)
+        await follow_data_version(read_engine or engine)
+
+        seasons.update(np.unique(columns['season']).tolist())
+        players.update(np.unique(columns['player_name']).tolist())
+
+        total += len(records)
+        if on_batch:
+            on_batch(IngestResult(rows=total, seconds=time.perf_counter() - start))
+
+    async with engine.begin() as conn:
+        await refresh_summaries(conn, seasons, players)
+        await bump_data_version(conn)
+    await follow_data_version(read_engine or engine)
+
+    return IngestResult(rows=total, seconds=time.perf_counter() - start)
+
+
+async def existing_keys(conn: AsyncConnection, records: List[tuple]) -> Set[tuple]:
+    players = sorted({record[INSERT_COLUMNS.index('player_name')] for record in records})
+    keys = set()
+
+    for chunk in chunks(players, KEY_CHUNK_SIZE):
+        result = await conn.execute(
+            select(Stats.season, Stats.player_name, Stats.team).where(Stats.player_name.in_(chunk))
+        )
+        keys.update(tuple(row) for row in result.all())
+
+    return keys
+
+
+async def apply_delta(
+        engine: AsyncEngine,
+        columns: Dict[str, np.ndarray],
+        source: str,
+        read_engine: Optional[AsyncEngine] = None,
+) -> DeltaResult:
+    """
+    Applies a delta of new and corrected rows in a single transaction: the upsert, its change log,
+    the summary groups for the affected seasons and players, and the version bump commit together.
+    Cached results outside those seasons and players are kept.
+    """
+    start = time.perf_counter()
+    records = columns_to_records(columns)
+
+    key_indexes = [INSERT_COLUMNS.index(name) for name in CONFLICT_COLUMNS]
+    keys = [tuple(record[i] for i in key_indexes) for record in records]
+
+    async with engine.begin() as conn:
+        existing = await existing_keys(conn, records)
+        await write_batch(conn, records)
+        version = await bump_data_version(conn)
+
+        changes = [
+            dict(zip(CONFLICT_COLUMNS, key), version=version, operation='update' if key in existing else 'insert')
+            for key in keys
+        ]
+        await conn.execute(insert(StatsChange), changes)
+
+        seasons = sorted({season for season, _, _ in keys})
+        players = sorted({player_name for _, player_name, _ in keys})
+        await refresh_summaries(conn, seasons, players)
+
+        updated = sum(change['operation'] == 'update' for change in changes)
+        await conn.execute(insert(StatsChangeSet).values(
+            version=version,
+            applied_at=func.now(),
+            source=source,
+            inserted=len(changes) - updated,
+            updated=updated,
+        ))
+
+    await follow_data_version(read_engine or engine)
+
+    return DeltaResult(
+        version=version,
+        inserted=len(changes) - updated,
+        updated=updated,
+        seasons=seasons,
+        players=players,
+        seconds=time.perf_counter() - start,
+    )
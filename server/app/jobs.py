@@ -0,0 +1,145 @@
+import asyncio
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app import settings
+
+# Statuses a job ends in; its result is kept until the TTL runs out or newer results need the room
+FINISHED = ('done', 'failed', 'cancelled')
+
+# Jobs live in the worker that accepted them, and a load balancer wouldn't route the polls back to it,
+# so /jobs is only served by a single worker
+JOBS_ENABLED = settings.SERVER_WORKERS == 1
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str = 'queued'
+    submitted_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[bytes] = field(default=None, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def describe(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "expires_at": self.expires_at,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """
+    Runs heavy requests in the background of this process, so the request that submits one
+    returns at once and the chart routes don't queue behind it.
+
+    At most `concurrency` jobs run at a time, which also caps the pooled connections they hold;
+    the others wait their turn. Finished jobs keep their result for `ttl` seconds, as long as all
+    the results together fit in `max_result_bytes`; past that the oldest are dropped first. Jobs
+    live in the worker that accepted them, which is why /jobs isn't served with several workers.
+    """
+
+    def __init__(self, concurrency: int, ttl: float, max_jobs: int, max_result_bytes: int) -> None:
+        self.ttl = timedelta(seconds=ttl)
+        self.max_jobs = max_jobs
+        self.max_result_bytes = max_result_bytes
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def submit(self, kind: str, params: Dict[str, Any], run: Callable[[], Awaitable[bytes]]) -> Job:
+        self.evict_expired()
+        if len(self.jobs) >= self.max_jobs:
+            raise JobQueueFullError(f"Too many jobs ({self.max_jobs}), try again once some have finished.")
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, params=params)
+        job.task = asyncio.create_task(self.execute(job, run))
+        self.jobs[job.id] = job
+        return job
+
+    async def execute(self, job: Job, run: Callable[[], Awaitable[bytes]]) -> None:
+        try:
+            async with self.semaphore:
+                job.status = 'running'
+                job.started_at = datetime.now(timezone.utc)
+                result = await run()
+                if len(result) > self.max_result_bytes:
+                    raise ValueError(f"The result is too large to keep ({len(result)} bytes), narrow the request.")
+                job.result = result
+                job.status = 'done'
+                self.evict_results(keep=job)
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            job.expires_at = job.finished_at + self.ttl
+
+    def get(self, job_id: str) -> Job:
+        self.evict_expired()
+        if job_id not in self.jobs:
+            raise LookupError(f"No job {job_id}, it may have expired.")
+        return self.jobs[job_id]
+
+    def all_jobs(self) -> List[Job]:
+        self.evict_expired()
+        return list(self.jobs.values())
+
+    async def cancel(self, job_id: str) -> Job:
+        # A job still queued or running is stopped; a finished one is dropped with its result
+        job = self.get(job_id)
+        if job.finished:
+            del self.jobs[job_id]
+        else:
+            job.task.cancel()
+            await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    def evict_expired(self) -> None:
+        now = datetime.now(timezone.utc)
+        expired = [job_id for job_id, job in self.jobs.items() if job.expires_at and job.expires_at <= now]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def evict_results(self, keep: Job) -> None:
+        # Oldest first, until the finished results fit in max_result_bytes again
+        held = sum(len(job.result) for job in self.jobs.values() if job.result is not None)
+        for job_id, job in list(self.jobs.items()):
+            if held <= self.max_result_bytes:
+                break
+            if job.result is not None and job is not keep:
+                held -= len(job.result)
+                del self.jobs[job_id]
+
+    async def close(self) -> None:
+        tasks = [job.task for job in self.jobs.values() if not job.finished]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_queue = JobQueue(settings.JOB_CONCURRENCY, settings.JOB_RESULT_TTL_SECONDS, settings.JOB_MAX_JOBS, settings.JOB_MAX_RESULT_BYTES)
@@ -0,0 +1,178 @@
+import asyncio
+from difflib import SequenceMatcher
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+import orjson
+
+from app import settings
+from app.cache import query_cache
+
+Compute = Callable[[], Awaitable[Any]]
+
+# Same options as the ORJSONResponse the chart routes use
+JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(message: dict) -> bytes:
+    return orjson.dumps(message, option=JSON_OPTIONS)
+
+
+def tagged(message: bytes, subscription: str) -> bytes:
+    # {"type": ...} -> {"id": subscription, "type": ...}, without serializing the message again
+    return b'{"id":' + dumps(subscription) + b',' + message[1:]
+
+
+def list_patch(old: Any, new: Any) -> Optional[List[list]]:
+    """
+    The splices turning the old rows into the new ones, as [start, end, rows] meaning
+    old[start:end] = rows, in old order, so they apply from the last to the first.
+    None when the results aren't lists or the patch would carry most of the new rows anyway.
+    """
+    if not isinstance(old, list) or not isinstance(new, list):
+        return None
+
+    matcher = SequenceMatcher(None, [dumps(row) for row in old], [dumps(row) for row in new], autojunk=False)
+    ops = [[i1, i2, new[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+    if sum(len(rows) for _, _, rows in ops) * 2 > len(new):
+        return None
+    return ops
+
+
+class Topic:
+    """
+    One chart with one set of filters, shared by every subscriber asking for it.
+    Messages are serialized once and the same bytes go to every subscriber.
+    """
+
+    def __init__(self, compute: Compute) -> None:
+        self.compute = compute
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.data: Any = None
+        self.version: Optional[int] = None
+        self.state: Optional[Tuple[str, int]] = None
+        self.snapshot_message: Optional[bytes] = None
+        self.lock = asyncio.Lock()
+
+    def snapshot(self) -> bytes:
+        if self.snapshot_message is None:
+            self.snapshot_message = dumps({"type": "snapshot", "version": self.version, "data": self.data})
+        return self.snapshot_message
+
+    def message(self, previous: Any, data: Any, version: int) -> bytes:
+        # Diffing and serializing a large result takes seconds, so refresh runs this in a thread.
+        # Past LIVE_PATCH_MAX_ROWS rows a snapshot is sent without trying to diff.
+        ops = None
+        if previous is not None and not (isinstance(data, list) and len(data) > settings.LIVE_PATCH_MAX_ROWS):
+            ops = list_patch(previous, data)
+        if ops is None:
+            self.snapshot_message = dumps({"type": "snapshot", "version": version, "data": data})
+            return self.snapshot_message
+        return dumps({"type": "patch", "version": version, "ops": ops})
+
+    def deliver(self, queue: asyncio.Queue, message: bytes) -> None:
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Patches only apply in sequence, so a subscriber this far behind starts over from the current result
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(self.snapshot())
+
+    async def refresh(self) -> None:
+        async with self.lock:
+            state = query_cache.state
+            if state == self.state:
+                return
+
+            data = await self.compute()
+            previous = self.data
+            first = self.state is None
+            self.state = state
+            _, version = state
+            self.version = version
+
+            # Results the change didn't touch come back from the query cache as the same object
+            if not first and (data is previous or data == previous):
+                return
+
+            self.data = data
+            self.snapshot_message = None
+            message = await asyncio.to_thread(self.message, None if first else previous, data, version)
+
+            for queue in self.subscribers:
+                self.deliver(queue, message)
+
+
+class LiveHub:
+    """
+    Pushes chart results to subscribed dashboards instead of having each of them poll.
+
+    Subscribers asking for the same chart and filters share a Topic. When the data version
+    moves, every topic is recomputed once and subscribers get the change: a patch of the rows
+    when that is smaller, otherwise a new snapshot. Recomputing goes through the query cache,
+    so topics a delta didn't touch cost a cache hit and send nothing.
+    """
+
+    def __init__(self) -> None:
+        self.topics: Dict[Hashable, Topic] = {}
+        self.changed = asyncio.Event()
+
+    async def subscribe(self, key: Hashable, compute: Compute) -> asyncio.Queue:
+        # The queue starts with a snapshot of the current result, then receives every change
+        topic = self.topics.setdefault(key, Topic(compute))
+        queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+
+        # Registered first, so the topic isn't dropped by another subscriber leaving meanwhile
+        topic.subscribers.add(queue)
+        try:
+            await topic.refresh()
+        except BaseException:
+            # including cancellation, the subscriber may leave while the first result computes
+            self.unsubscribe(key, queue)
+            raise
+
+        # Whatever arrived during the refresh is already part of the snapshot
+        async with topic.lock:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(topic.snapshot())
+        return queue
+
+    def unsubscribe(self, key: Hashable, queue: asyncio.Queue) -> None:
+        topic = self.topics.get(key)
+        if topic is None:
+            return
+
+        topic.subscribers.discard(queue)
+        if not topic.subscribers:
+            del self.topics[key]
+
+    def data_changed(self, version: int) -> None:
+        self.changed.set()
+
+    async def refresh_topics(self) -> None:
+        semaphore = asyncio.Semaphore(settings.LIVE_REFRESH_CONCURRENCY)
+
+        async def refresh(topic: Topic) -> None:
+            async with semaphore:
+                try:
+                    await topic.refresh()
+                except Exception:
+                    # subscribers keep the last result, the next data change tries again
+                    pass
+
+        await asyncio.gather(*(refresh(topic) for topic in list(self.topics.values())))
+
+    async def run(self) -> None:
+        query_cache.listeners.append(self.data_changed)
+        try:
+            while True:
+                await self.changed.wait()
+                self.changed.clear()
+                await self.refresh_topics()
+        finally:
+            query_cache.listeners.remove(self.data_changed)
+
+
+live_hub = LiveHub()
@@ -0,0 +1,162 @@
+import bisect
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+
+# Seconds per phase for the request being handled, None outside of a profiled request
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_timings', default=None)
+
+
+def record(name: str, seconds: float) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+LATENCY_BUCKETS = [0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0]
+
+
+class Histogram:
+    def __init__(self, buckets: List[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> List[tuple]:
+        # (upper bound, observations <= bound), the last bound is +Inf
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "buckets": {("+Inf" if bound == float('inf') else str(bound)): count for bound, count in self.cumulative()},
+        }
+
+
+class PoolMetrics:
+    def __init__(self) -> None:
+        # seconds spent waiting for a connection from the pool
+        self.checkout_latency = Histogram(LATENCY_BUCKETS)
+        self.timeouts = 0
+
+
+class RouteMetrics:
+    def __init__(self) -> None:
+        self.duration: Dict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        # route -> phase -> total seconds
+        self.phases: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def observe(self, route: str, timings: Dict[str, float]) -> None:
+        self.duration[route].observe(timings['total'])
+        for name, seconds in timings.items():
+            if name != 'total':
+                self.phases[route][name] += seconds
+
+
+route_metrics = RouteMetrics()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default async queue pool, timing every checkout so pool pressure shows up in its metrics.
+    Each engine's pool keeps its own, so the write and read pools are reported apart.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> 'InstrumentedQueuePool':
+        # Disposing the engine swaps in a new pool, the counts carry over to it
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.metrics.checkout_latency.observe(waited)
+            record('db_wait', waited)
+
+
+def pool_status(pool: InstrumentedQueuePool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "timeouts": pool.metrics.timeouts,
+        "checkout_latency_seconds": pool.metrics.checkout_latency.to_dict(),
+    }
+
+
+def prometheus_histogram(lines: List[str], name: str, histogram: Histogram, labels: str = '') -> None:
+    separator = ',' if labels else ''
+    for bound, count in histogram.cumulative():
+        le = '+Inf' if bound == float('inf') else bound
+        lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {count}')
+
+    label_set = f'{{{labels}}}' if labels else ''
+    lines.append(f'{name}_sum{label_set} {histogram.total}')
+    lines.append(f'{name}_count{label_set} {histogram.count}')
+
+
+def render_prometheus(pools: Dict[str, InstrumentedQueuePool], cache_stats: dict) -> str:
+    """
+    All metrics in the Prometheus text exposition format, the pool metrics labelled with
+    the pool's name. Per-route phase timings are only collected while ProfilingMiddleware is enabled.
+    """
+    lines = [
+        '# TYPE stats_request_duration_seconds histogram',
+    ]
+    for route, histogram in route_metrics.duration.items():
+        prometheus_histogram(lines, 'stats_request_duration_seconds', histogram, f'route="{route}"')
+
+    lines.append('# TYPE stats_request_phase_seconds_total counter')
+    for route, phases in route_metrics.phases.items():
+        for name, seconds in phases.items():
+            lines.append(f'stats_request_phase_seconds_total{{route="{route}",phase="{name}"}} {seconds}')
+
+    lines.append('# TYPE stats_query_cache_total counter')
+    for result in ('hits', 'misses', 'evictions', 'invalidations'):
+        lines.append(f'stats_query_cache_total{{result="{result}"}} {cache_stats[result]}')
+    lines.append('# TYPE stats_query_cache_entries gauge')
+    lines.append(f'stats_query_cache_entries {cache_stats["entries"]}')
+
+    if pools:
+        lines.append('# TYPE stats_db_pool_connections gauge')
+        for name, pool in pools.items():
+            lines.append(f'stats_db_pool_connections{{pool="{name}",state="checked_out"}} {pool.checkedout()}')
+            lines.append(f'stats_db_pool_connections{{pool="{name}",state="checked_in"}} {pool.checkedin()}')
+            lines.append(f'stats_db_pool_connections{{pool="{name}",state="overflow"}} {pool.overflow()}')
+        lines.append('# TYPE stats_db_pool_timeouts_total counter')
+        for name, pool in pools.items():
+            lines.append(f'stats_db_pool_timeouts_total{{pool="{name}"}} {pool.metrics.timeouts}')
+        lines.append('# TYPE stats_db_pool_checkout_seconds histogram')
+        for name, pool in pools.items():
+            prometheus_histogram(lines, 'stats_db_pool_checkout_seconds', pool.metrics.checkout_latency, f'pool="{name}"')
+
+    return '\n'.join(lines) + '\n'
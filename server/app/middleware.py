@@ -0,0 +1,57 @@
+import hashlib
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import settings
+from app.cache import query_cache
+
+
+def chart_etag(request: Request) -> str:
+    # Chart responses are a function of the data and the query, nothing else.
+    # The data version is shared through the database, so every worker hands out the same ETag;
+    # the generation keeps a recreated database's version 1 from matching the old one's.
+    # Weak, because the compression middleware outside sends the same ETag on every content-coding.
+    query = '&'.join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}".encode()).hexdigest()[:16]
+    return f'W/"{query_cache.generation}-{query_cache.data_version}-{digest}"'
+
+
+def opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    # If-None-Match compares weakly, with or without the W/ prefix on either side
+    candidates = [opaque_tag(candidate.strip()) for candidate in if_none_match.split(',')]
+    return '*' in candidates or opaque_tag(etag) in candidates
+
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """
+    Adds ETag and Cache-Control to chart responses and answers a matching If-None-Match with 304
+    before the route runs, so unchanged polls never reach the database.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        if request.method != 'GET' or not request.url.path.startswith('/charts/'):
+            return await call_next(request)
+
+        etag = chart_etag(request)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': settings.HTTP_CACHE_CONTROL,
+        }
+
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match and etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        response = await call_next(request)
+
+        # The data may have changed while the request ran, then the ETag above is already stale
+        if response.status_code == 200 and etag == chart_etag(request):
+            response.headers.update(headers)
+
+        return response
@@ -0,0 +1,283 @@
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Tuple
+
+import numpy as np
+from sqlalchemy import Index, MetaData, bindparam, delete, func, insert, inspect, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlmodel import SQLModel
+
+from app import settings
+from app.coordination import new_generation
+from app.ingest import derive_metrics
+from app.models import DataVersion, SchemaMigration, Stats
+from app.summaries import chunks
+
+# A copy of 'Stats' outside SQLModel.metadata, so create_all leaves these indexes to the migrations
+stats = Stats.__table__.to_metadata(MetaData())
+
+# Covering indexes for the chart queries: filter on season, read rows already in chart order.
+# INCLUDE is Postgres only, other backends get the same key columns.
+CHART_INDEXES = [
+    # total-points
+    Index(
+        'ix_stats_season_points',
+        stats.c.season, stats.c.points.desc(), stats.c.id,
+        postgresql_include=['player_name', 'team', 'goals', 'assists'],
+    ),
+    # production, gp is included for its gp > 0 filter
+    Index(
+        'ix_stats_season_points_per_game',
+        stats.c.season, stats.c.points_per_game.desc(), stats.c.id,
+        postgresql_include=['player_name', 'team', 'toi_per_game', 'gp'],
+    ),
+    # shooting-efficiency
+    Index(
+        'ix_stats_season_shooting_efficiency',
+        stats.c.season, stats.c.shooting_efficiency.desc(), stats.c.id,
+        postgresql_include=['player_name', 'team', 'goals', 'shots'],
+    ),
+    # per-game-consistency
+    Index(
+        'ix_stats_season_id',
+        stats.c.season, stats.c.id,
+        postgresql_include=['player_name', 'team', 'goals_per_game', 'assists_per_game', 'shots_per_game', 'toi_per_game'],
+    ),
+    # player filters, /stats keyset pages, /players and /stats/{player_name}
+    Index('ix_stats_player_season', stats.c.player_name, stats.c.season.desc(), stats.c.id),
+]
+
+# The same top-N charts without a season filter, e.g. /charts/total-points?limit=10: the season
+# indexes can't give their order, these stop after the first N rows
+LEADERBOARD_INDEXES = [
+    Index(
+        'ix_stats_points',
+        stats.c.points.desc(), stats.c.id,
+        postgresql_include=['player_name', 'team', 'season', 'goals', 'assists'],
+    ),
+    Index(
+        'ix_stats_points_per_game_id',
+        stats.c.points_per_game.desc(), stats.c.id,
+        postgresql_include=['player_name', 'team', 'season', 'toi_per_game', 'gp'],
+    ),
+    Index(
+        'ix_stats_shooting_efficiency_id',
+        stats.c.shooting_efficiency.desc(), stats.c.id,
+        postgresql_include=['player_name', 'team', 'season', 'goals', 'shots'],
+    ),
+]
+
+# Columns create_all adds to a new 'Stats' table but never to an existing one, and the indexes
+# they first came with (0004 replaces those)
+DERIVED_COLUMNS = ['toi_per_game', 'goals_per_game', 'assists_per_game', 'points_per_game', 'shots_per_game', 'shooting_percentage', 'shooting_efficiency']
+DERIVED_INDEXES = [
+    Index('ix_stats_points_per_game', stats.c.points_per_game),
+    Index('ix_stats_shooting_efficiency', stats.c.shooting_efficiency),
+]
+NATURAL_KEY = ['season', 'player_name', 'team']
+# A unique index rather than a constraint, SQLite can't add constraints to a table; ON CONFLICT accepts either
+NATURAL_KEY_INDEX = Index('uq_stats_season_player_name_team', *[stats.c[name] for name in NATURAL_KEY], unique=True)
+
+# For substring and fuzzy matching on names, which a btree can't serve
+PLAYER_NAME_TRIGRAM_INDEX = Index(
+    'ix_stats_player_name_trgm',
+    stats.c.player_name,
+    postgresql_using='gin',
+    postgresql_ops={'player_name': 'gin_trgm_ops'},
+)
+
+
+class DuplicateRowsError(RuntimeError):
+    pass
+
+
+@dataclass
+class Migration:
+    revision: str
+    description: str
+    upgrade: Callable[[AsyncConnection], Awaitable[None]]
+
+
+async def create_indexes(conn: AsyncConnection, indexes: List[Index]) -> None:
+    for index in indexes:
+        await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+
+async def backfill_derived_columns(conn: AsyncConnection) -> None:
+    # Same values as ingestion stores, computed by the same code
+    base = ['id', 'gp', 'toi', 'shots', 'goals', 'assists', 'points']
+    rows = (await conn.execute(select(*[stats.c[name] for name in base]))).all()
+
+    statement = update(stats).where(stats.c.id == bindparam('row_id')).values(
+        {name: bindparam(f'new_{name}') for name in DERIVED_COLUMNS}
+    )
+    for batch in chunks(rows, settings.INGEST_BATCH_SIZE):
+        columns = {name: np.array(values, dtype=np.int64) for name, values in zip(base, zip(*batch))}
+        derived = derive_metrics(columns)
+        await conn.execute(statement, [
+            {'row_id': row_id, **{f'new_{name}': derived[name][i].item() for name in DERIVED_COLUMNS}}
+            for i, row_id in enumerate(columns['id'].tolist())
+        ])
+
+
+async def duplicate_keys(conn: AsyncConnection) -> List[Tuple]:
+    # (season, player_name, team, rows) for every natural key held by more than one row
+    key = [stats.c[name] for name in NATURAL_KEY]
+    query = select(*key, func.count()).group_by(*key).having(func.count() > 1).order_by(*key)
+    return [tuple(row) for row in (await conn.execute(query)).all()]
+
+
+async def remove_duplicate_rows(engine: AsyncEngine) -> Tuple[int, List[Tuple]]:
+    """
+    Deletes every row but the newest (the one ingestion last wrote) of each duplicated natural key,
+    and returns how many rows went and the keys they had. Run by `python migrate.py dedupe`, never on startup.
+    """
+    async with engine.begin() as conn:
+        keys = await duplicate_keys(conn)
+        if not keys:
+            return 0, []
+
+        newest = select(func.max(stats.c.id)).group_by(*[stats.c[name] for name in NATURAL_KEY])
+        result = await conn.execute(delete(stats).where(stats.c.id.not_in(newest)))
+        return result.rowcount, keys
+
+
+async def has_natural_key(conn: AsyncConnection) -> bool:
+    def unique_keys(sync_conn):
+        inspector = inspect(sync_conn)
+        constraints = inspector.get_unique_constraints(stats.name)
+        indexes = [index for index in inspector.get_indexes(stats.name) if index['unique']]
+        return [set(key['column_names']) for key in constraints + indexes]
+
+    return set(NATURAL_KEY) in await conn.run_sync(unique_keys)
+
+
+async def check_no_duplicates(conn: AsyncConnection) -> None:
+    # Duplicates would fail the unique index; which row to keep is the operator's call, so the upgrade stops
+    duplicates = await duplicate_keys(conn)
+    if not duplicates:
+        return
+
+    listed = '; '.join(f"{season} {player_name} {team} ({rows} rows)" for season, player_name, team, rows in duplicates[:10])
+    raise DuplicateRowsError(
+        f"{len(duplicates)} (season, player_name, team) keys have more than one row: {listed}"
+        f"{'; ...' if len(duplicates) > 10 else ''}. "
+        "Run `python migrate.py dedupe` to keep only the newest row of each, then upgrade again."
+    )
+
+
+async def upgrade_stats_table(conn: AsyncConnection) -> None:
+    """
+    Brings a 'Stats' table created before the derived metrics were stored up to the model:
+    adds and fills the derived columns with their indexes, and the unique key upserts rely on.
+    A table create_all made from the current model already has all of it, then nothing changes.
+    """
+    # Checked before any change: SQLite commits ALTER TABLE at once, a later failure would leave the columns unfilled
+    natural_key = await has_natural_key(conn)
+    if not natural_key:
+        await check_no_duplicates(conn)
+
+    existing = await conn.run_sync(lambda sync_conn: {column['name'] for column in inspect(sync_conn).get_columns(stats.name)})
+    missing = [name for name in DERIVED_COLUMNS if name not in existing]
+
+    for name in missing:
+        await conn.execute(text(f"ALTER TABLE {stats.name} ADD COLUMN {name} FLOAT NOT NULL DEFAULT 0"))
+    if missing:
+        await backfill_derived_columns(conn)
+
+    await create_indexes(conn, DERIVED_INDEXES)
+    if not natural_key:
+        await create_indexes(conn, [NATURAL_KEY_INDEX])
+
+
+async def add_chart_indexes(conn: AsyncConnection) -> None:
+    await create_indexes(conn, CHART_INDEXES)
+    # Both are leading prefixes of the composite indexes above
+    await conn.execute(text("DROP INDEX IF EXISTS ix_stats_season"))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_stats_player_name"))
+
+
+async def add_player_name_trigram_index(conn: AsyncConnection) -> None:
+    if conn.dialect.name != 'postgresql':
+        return
+
+    # pg_trgm ships with contrib, which some servers don't install; searches then just go without the index
+    available = await conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+    if available.first() is None:
+        return
+
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    await create_indexes(conn, [PLAYER_NAME_TRIGRAM_INDEX])
+
+
+async def add_leaderboard_indexes(conn: AsyncConnection) -> None:
+    await create_indexes(conn, LEADERBOARD_INDEXES)
+    # Both are leading prefixes of the indexes above
+    await conn.execute(text("DROP INDEX IF EXISTS ix_stats_points_per_game"))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_stats_shooting_efficiency"))
+
+
+async def add_data_version_generation(conn: AsyncConnection) -> None:
+    # create_all adds the column to a new table; an older one gets it here, with its own random token
+    table = DataVersion.__table__.name
+    existing = await conn.run_sync(lambda sync_conn: {column['name'] for column in inspect(sync_conn).get_columns(table)})
+    if 'generation' in existing:
+        return
+
+    await conn.execute(text(f"ALTER TABLE {table} ADD COLUMN generation VARCHAR NOT NULL DEFAULT ''"))
+    await conn.execute(update(DataVersion.__table__).values(generation=new_generation()))
+
+
+# Applied in list order, each in its own transaction; append new revisions, never edit applied ones.
+# 0000 comes first because the chart indexes of 0001 are on the columns it adds.
+MIGRATIONS = [
+    Migration('0000', 'Derived metric columns and the unique key on pre-existing Stats tables', upgrade_stats_table),
+    Migration('0001', 'Composite covering indexes for the chart queries', add_chart_indexes),
+    Migration('0002', 'Trigram index on player_name', add_player_name_trigram_index),
+    Migration('0003', 'Generation token on the data version', add_data_version_generation),
+    Migration('0004', 'Indexes for the top-N charts without a season filter', add_leaderboard_indexes),
+]
+
+
+async def applied_revisions(engine: AsyncEngine) -> List[str]:
+    async with engine.connect() as conn:
+        result = await conn.execute(select(SchemaMigration.revision).order_by(SchemaMigration.revision))
+        return result.scalars().all()
+
+
+async def pending_migrations(engine: AsyncEngine) -> List[Migration]:
+    applied = set(await applied_revisions(engine))
+    return [migration for migration in MIGRATIONS if migration.revision not in applied]
+
+
+async def schema_is_current(engine: AsyncEngine) -> bool:
+    """
+    The schema stamp: every table exists and every migration is recorded. Startup then
+    skips create_all and the migration pass, two catalog queries instead of one per table.
+    """
+    async with engine.connect() as conn:
+        tables = await conn.run_sync(lambda sync_conn: set(inspect(sync_conn).get_table_names()))
+        if not set(SQLModel.metadata.tables) <= tables:
+            return False
+
+        revisions = [migration.revision for migration in MIGRATIONS]
+        applied = select(func.count()).where(SchemaMigration.revision.in_(revisions))
+        return (await conn.execute(applied)).scalar_one() == len(revisions)
+
+
+async def upgrade(engine: AsyncEngine) -> List[Migration]:
+    """
+    Applies every pending migration and returns them. Tables themselves come from
+    SQLModel.metadata.create_all, so this runs after it.
+    """
+    pending = await pending_migrations(engine)
+
+    for migration in pending:
+        async with engine.begin() as conn:
+            await migration.upgrade(conn)
+            await conn.execute(insert(SchemaMigration).values(
+                revision=migration.revision,
+                description=migration.description,
+                applied_at=func.now(),
+            ))
+
+    return pending
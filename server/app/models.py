@@ -1,6 +1,8 @@
-from typing import Optional
+from datetime import datetime
+from typing import Annotated, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, StringConstraints
+from sqlalchemy import UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
@@ -41,9 +43,13 @@ TEAM_MAPPING = {
 
 
 class Stats(SQLModel, table=True):
+    # One row per player, team and season, ingestion upserts on this key
+    __table_args__ = (UniqueConstraint('season', 'player_name', 'team'),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    season: int = Field(index=True)
-    player_name: str = Field(index=True) # trusting the format is "Last, First" for simplicity
+    # Indexes matching the chart queries are created by app.migrations
+    season: int = Field()
+    player_name: str = Field() # trusting the format is "Last, First" for simplicity
     team: str = Field(index=True)
     gp: int = Field()
     toi: int = Field()
@@ -53,39 +59,96 @@ class Stats(SQLModel, table=True):
     points: int = Field()
     scouting_grade: int = Field()
 
+    # Derived metrics, computed once at ingest time (see app.ingest.derive_metrics)
+    toi_per_game: float = Field(default=0.0)
+    goals_per_game: float = Field(default=0.0)
+    assists_per_game: float = Field(default=0.0)
+    points_per_game: float = Field(default=0.0)
+    shots_per_game: float = Field(default=0.0)
+    # percentage of shots that are goals, and the same ratio unscaled at a finer rounding for sorting
+    shooting_percentage: float = Field(default=0.0)
+    shooting_efficiency: float = Field(default=0.0)
+
     @property
     def team_full_name(self) -> str:
         return TEAM_MAPPING.get(self.team, "Unknown Team")
 
-    @property
-    def toi_per_game(self) -> float:
-        return round(self.toi / self.gp, 2) if self.gp > 0 else 0.0
-
-    @property
-    def goals_per_game(self) -> float:
-        return round(self.goals / self.gp, 2) if self.gp > 0 else 0.0
-
-    @property
-    def assists_per_game(self) -> float:
-        return round(self.assists / self.gp, 2) if self.gp > 0 else 0.0
-
-    @property
-    def points_per_game(self) -> float:
-        return round(self.points / self.gp, 2) if self.gp > 0 else 0.0
-
-    @property
-    def shots_per_game(self) -> float:
-        return round(self.shots / self.gp, 2) if self.gp > 0 else 0.0
-
-    @property
-    def shooting_percentage(self) -> float:
-        # percentage of shots that are goals
-        return round(self.goals / self.shots * 100, 1) if self.shots > 0 else 0.0
-
     # more ...
     # def plus_minus(self):
     #     pass
 
+# Summary tables, kept up to date from 'Stats' by app.summaries.refresh_summaries
+class SeasonGradeSummary(SQLModel, table=True):
+    season: int = Field(primary_key=True)
+    scouting_grade: int = Field(primary_key=True)
+    player_seasons: int = Field()
+    total_points: int = Field()
+    average_points: float = Field()
+
+
+class SeasonTeamSummary(SQLModel, table=True):
+    season: int = Field(primary_key=True)
+    team: str = Field(primary_key=True)
+    players: int = Field()
+    total_games: int = Field()
+    total_goals: int = Field()
+    total_assists: int = Field()
+    total_points: int = Field(index=True)
+    total_shots: int = Field()
+
+
+class PlayerCareerTotals(SQLModel, table=True):
+    player_name: str = Field(primary_key=True)
+    seasons_included: int = Field()
+    total_games: int = Field()
+    total_goals: int = Field()
+    total_assists: int = Field()
+    total_points: int = Field()
+    total_shots: int = Field()
+    total_toi: int = Field()
+    avg_scouting_grade: float = Field()
+
+
+class DataVersion(SQLModel, table=True):
+    # Single row, bumped by every write to 'Stats'; caches and ETags are keyed on it.
+    # The generation is random per row, so versions from a recreated or restored database never match older ones.
+    id: int = Field(default=1, primary_key=True)
+    version: int = Field(default=0)
+    generation: str = Field(default='')
+
+
+class SummaryRefresh(SQLModel, table=True):
+    summary: str = Field(primary_key=True)
+    refreshed_at: datetime = Field()
+    full: bool = Field() # False when only the affected seasons/players were recomputed
+    keys_refreshed: int = Field()
+
+
+class SchemaMigration(SQLModel, table=True):
+    # One row per applied app.migrations revision
+    revision: str = Field(primary_key=True)
+    description: str = Field()
+    applied_at: datetime = Field()
+
+
+class StatsChangeSet(SQLModel, table=True):
+    # One per applied delta, keyed on the data version it produced
+    version: int = Field(primary_key=True)
+    applied_at: datetime = Field()
+    source: str = Field()
+    inserted: int = Field()
+    updated: int = Field()
+
+
+class StatsChange(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    version: int = Field(index=True)
+    season: int = Field()
+    player_name: str = Field()
+    team: str = Field()
+    operation: str = Field() # "insert" or "update"
+
+
 # Naming things can be hard sometimes
 class StatsExtended(BaseModel):
     id: int
@@ -108,14 +171,56 @@ class StatsExtended(BaseModel):
     scouting_grade: int
 
 
-async def stat_to_extended_model(stat: Stats) -> StatsExtended:
-    return StatsExtended(
-        **stat.model_dump(),
-        team_full_name=stat.team_full_name,
-        toi_per_game=stat.toi_per_game,
-        shots_per_game=stat.shots_per_game,
-        goals_per_game=stat.goals_per_game,
-        assists_per_game=stat.assists_per_game,
-        points_per_game=stat.points_per_game,
-        shooting_percentage=stat.shooting_percentage
-    )
+# Response schemas for the /stats routes, which return pre-shaped rows and skip validation
+class StatsPage(BaseModel):
+    data: List[StatsExtended]
+    next_cursor: Optional[str]
+
+
+class StatsList(BaseModel):
+    data: List[StatsExtended]
+
+
+# Request body for /ingest/delta, one entry per new or corrected (season, player_name, team) row
+class StatsDeltaRow(BaseModel):
+    season: int
+    player_name: str
+    team: str
+    gp: int
+    toi: Annotated[str, StringConstraints(pattern=r'^\d+:\d+\.?$')] # "minutes:seconds", as in the CSV feed
+    shots: int
+    goals: int
+    assists: int
+    points: int
+    scouting_grade: int
+
+
+class StatsDelta(BaseModel):
+    rows: List[StatsDeltaRow]
+    source: str = "api"
+
+
+# Request body for POST /jobs; which fields apply depends on the kind
+class JobRequest(BaseModel):
+    kind: str # comparison, percentiles or export
+    season: Optional[int] = None
+    players: Optional[str] = None # "A|B", all players when empty
+    metric: str = "points_per_game"
+    format: str = "parquet"
+    columns: Optional[str] = None
+
+
+# Columns to select for a StatsExtended row, team_full_name is filled in from TEAM_MAPPING
+STATS_EXTENDED_FIELDS = list(StatsExtended.model_fields)
+STATS_EXTENDED_COLUMNS = [getattr(Stats, name) for name in STATS_EXTENDED_FIELDS if name != 'team_full_name']
+
+
+def stats_extended_row(row) -> dict:
+    """
+    Shapes a row selected with STATS_EXTENDED_COLUMNS into a plain dict with the StatsExtended
+    fields, without building (and later re-validating) a model per row.
+    """
+    data = row._asdict()
+    data['team_full_name'] = TEAM_MAPPING.get(row.team, "Unknown Team")
+    data['toi'] = float(row.toi)
+    return {name: data[name] for name in STATS_EXTENDED_FIELDS}
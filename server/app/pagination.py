@@ -0,0 +1,51 @@
+import base64
+import json
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from app.models import Stats
+
+# Keyset pagination over the /stats ordering: (player_name, season desc, id).
+# The cursor is the sort key of the last row on a page, encoded so clients treat it as opaque.
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(row) -> str:
+    # row: a Stats row, or any selected row with player_name, season and id
+    raw = json.dumps([row.player_name, row.season, row.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        player_name, season, stat_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(player_name), int(season), int(stat_id)
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Invalid cursor")
+
+
+def after_cursor(cursor: Optional[str]):
+    """
+    Condition selecting the rows that sort after the cursor.
+    Season is descending, so a plain row-value comparison can't be used.
+    """
+    if not cursor:
+        return None
+
+    player_name, season, stat_id = decode_cursor(cursor)
+
+    return or_(
+        Stats.player_name > player_name,
+        and_(
+            Stats.player_name == player_name,
+            or_(
+                Stats.season < season,
+                and_(Stats.season == season, Stats.id > stat_id),
+            ),
+        ),
+    )
@@ -0,0 +1,131 @@
+import hmac
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import settings
+from app.metrics import record, request_timings, route_metrics
+
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        with phase('encode'):
+            return super().render(content)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    # Time spent executing SQL, including fetching the rows
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record('query', time.perf_counter() - context._query_start)
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval from a background thread.
+    The result is in folded format ("outer;inner count" per line), ready for flame graph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({Path(frame.f_code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self) -> str:
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def profile_requested(request: Request) -> bool:
+    # Sampling slows every request on the loop, so only holders of the token can start it
+    header = request.headers.get('x-profile')
+    return bool(settings.PROFILE_TOKEN and header) and hmac.compare_digest(header.encode(), settings.PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Records where each request spends its time: waiting on the pool, running SQL, encoding the response,
+    and the rest of the Python work (transform). Timings go to a Server-Timing header and to /metrics.
+
+    Sending "X-Profile: <PROFILE_TOKEN>" also samples the event loop thread for the duration of
+    the request and writes a folded stack file to PROFILE_DIR. Everything on the loop is sampled,
+    including other requests running at the same time. Without a PROFILE_TOKEN nobody can.
+    """
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        timings: Dict[str, float] = {}
+        token = request_timings.set(timings)
+        sampler = None
+        if profile_requested(request):
+            sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+            sampler.__enter__()
+
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            total = time.perf_counter() - start
+            request_timings.reset(token)
+            if sampler:
+                sampler.__exit__(None, None, None)
+
+        accounted = sum(timings.get(name, 0.0) for name in ('db_wait', 'query', 'encode'))
+        timings['transform'] = max(total - accounted, 0.0)
+        timings['total'] = total
+
+        route = request.scope.get('route')
+        route_metrics.observe(route.path if route else 'unmatched', timings)
+
+        response.headers['Server-Timing'] = ', '.join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()
+        )
+
+        if sampler:
+            profile_dir = Path(settings.PROFILE_DIR)
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            path = profile_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}-{id(sampler)}.folded"
+            path.write_text(sampler.folded())
+
+        return response
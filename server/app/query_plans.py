@@ -0,0 +1,152 @@
+import json
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Set
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Stats
+from app.service import StatsService
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    call: Callable[[StatsService, int, List[str]], Awaitable]
+    index: str
+    # Most checks read rows already in order from the index, a sort means the index stopped serving the ORDER BY
+    allow_sort: bool = False
+
+
+@dataclass
+class PlanResult:
+    name: str
+    index: str
+    indexes_used: List[str]
+    sorts: int
+    allow_sort: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.index in self.indexes_used and (self.allow_sort or self.sorts == 0)
+
+
+# Each StatsService query with a filter or a top-N limit, and the index it should be served from.
+# __wrapped__ skips the query cache, so the query always runs.
+PLAN_CHECKS = [
+    PlanCheck(
+        'total-points by season',
+        lambda service, season, players: StatsService.get_goals_assists_chart_data.__wrapped__(service, season=season),
+        'ix_stats_season_points',
+    ),
+    PlanCheck(
+        'production by season',
+        lambda service, season, players: StatsService.get_production_chart_data.__wrapped__(service, season=season),
+        'ix_stats_season_points_per_game',
+    ),
+    PlanCheck(
+        'shooting-efficiency by season',
+        lambda service, season, players: StatsService.get_shooting_efficiency_chart_data.__wrapped__(service, season=season),
+        'ix_stats_season_shooting_efficiency',
+    ),
+    PlanCheck(
+        'per-game-consistency by season',
+        lambda service, season, players: StatsService.get_per_game_consistency_chart_data.__wrapped__(service, season=season),
+        'ix_stats_season_id',
+    ),
+    PlanCheck(
+        'total-points top N',
+        lambda service, season, players: StatsService.get_goals_assists_chart_data.__wrapped__(service, limit=10),
+        'ix_stats_points',
+    ),
+    PlanCheck(
+        'production top N',
+        lambda service, season, players: StatsService.get_production_chart_data.__wrapped__(service, limit=10),
+        'ix_stats_points_per_game_id',
+    ),
+    PlanCheck(
+        'shooting-efficiency top N',
+        lambda service, season, players: StatsService.get_shooting_efficiency_chart_data.__wrapped__(service, limit=10),
+        'ix_stats_shooting_efficiency_id',
+    ),
+    PlanCheck(
+        'total-points by players',
+        lambda service, season, players: StatsService.get_goals_assists_chart_data.__wrapped__(service, player_list=players),
+        'ix_stats_player_season',
+        # the index finds the players' few rows, which are then sorted by points
+        allow_sort=True,
+    ),
+    PlanCheck(
+        'stats page',
+        lambda service, season, players: service.get_stats_page(100),
+        'ix_stats_player_season',
+    ),
+    PlanCheck(
+        'stats by player',
+        lambda service, season, players: service.get_stats_by_player_name(players[0]),
+        'ix_stats_player_season',
+    ),
+]
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+async def capture_statements(engine: AsyncEngine, call: Callable[[StatsService], Awaitable]) -> List[tuple]:
+    # Runs the service call as the app would and keeps the SQL it sends, with its parameters
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    event.listen(engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        async with session_factory() as session:
+            await call(StatsService(session))
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', capture)
+
+    return statements
+
+
+async def explain(engine: AsyncEngine, statement: str, parameters) -> dict:
+    async with engine.begin() as conn:
+        # Small or freshly loaded tables are cheaper to scan; this asks which index the query can use
+        await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        await conn.exec_driver_sql("SET LOCAL enable_bitmapscan = off")
+        result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = result.scalar_one()
+
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return plan[0]['Plan']
+
+
+async def check_plans(engine: AsyncEngine) -> List[PlanResult]:
+    """
+    EXPLAINs the SQL each PLAN_CHECKS call sends and reports the indexes its plan uses.
+    Postgres only, the index choices are specific to its planner.
+    """
+    async with engine.connect() as conn:
+        season = (await conn.execute(select(func.max(Stats.season)))).scalar_one()
+        players = (await conn.execute(select(Stats.player_name).distinct().limit(2))).scalars().all()
+
+    results = []
+    for check in PLAN_CHECKS:
+        indexes_used: Set[str] = set()
+        sorts = 0
+
+        for statement, parameters in await capture_statements(engine, lambda service: check.call(service, season, players)):
+            for node in plan_nodes(await explain(engine, statement, parameters)):
+                if 'Index Name' in node:
+                    indexes_used.add(node['Index Name'])
+                if node['Node Type'] in ('Sort', 'Incremental Sort'):
+                    sorts += 1
+
+        results.append(PlanResult(check.name, check.index, sorted(indexes_used), sorts, check.allow_sort))
+
+    return results
@@ -1,11 +1,30 @@
-from typing import Optional, List
+import asyncio
+import hmac
+from dataclasses import asdict
+from typing import Awaitable, Callable, Dict, Optional, List
 
-from fastapi import APIRouter, Depends
+import orjson
+from fastapi import APIRouter, Depends, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from app.models import stat_to_extended_model
-from app.service import StatsService
+from app import settings
+from app.cache import query_cache
+from app.db import session_manager
+from app.downsample import DOWNSAMPLE_MODES
+from app.export import EXPORT_FORMATS, export_bytes, export_fields, stream_export
+from app.ingest import apply_delta, read_rows
+from app.jobs import JOBS_ENABLED, JobQueueFullError, job_queue
+from app.live import dumps, live_hub, tagged
+from app.metrics import pool_status, render_prometheus
+from app.models import JobRequest, StatsDelta, StatsList, StatsPage, stats_extended_row
+from app.pagination import InvalidCursorError
+from app.profiling import TimedORJSONResponse
+from app.service import SCATTER_CHARTS, TRAJECTORY_METRICS, StatsService, get_stats_service
+from app.startup import startup_state
 
 router = APIRouter()
+# Mounted only when JOBS_ENABLED
+jobs_router = APIRouter()
 
 def parse_players(players: str = None) -> Optional[List[str]]:
     return players.split('|') if players else None
@@ -16,83 +35,431 @@ async def health():
     return {"status": "ok"}
 
 
-@router.get('/stats')
-async def stats(stats_service: StatsService = Depends()):
-    response = []
-    data = await stats_service.get_stats()
+@router.get('/health/live')
+async def liveness():
+    # Answering at all shows the event loop is running; only a failed startup needs a restart
+    if startup_state.failed:
+        return ORJSONResponse(startup_state.status(), status_code=503)
+    return {"status": "ok"}
+
+
+@router.get('/health/ready')
+async def readiness():
+    # 503 until the database is initialized and the warm-up is done, with the progress so far
+    return ORJSONResponse(startup_state.status(), status_code=200 if startup_state.ready else 503)
+
+
+async def stream_stats_ndjson(batch_size: int):
+    # Streaming outlives the request-scoped session, so it opens its own
+    async with session_manager.read_session_factory() as session:
+        stats_service = StatsService(session)
+        async for page in stats_service.iter_stats(batch_size):
+            yield b''.join(orjson.dumps(stats_extended_row(row)) + b'\n' for row in page)
+
+
+@router.get('/cache/stats')
+async def cache_stats():
+    return {"data": query_cache.stats()}
+
+
+@router.get('/metrics/pool')
+async def metrics_pool():
+    return {"data": {name: pool_status(pool) for name, pool in session_manager.pools().items()}}
 
-    for s in data:
-        extended = await stat_to_extended_model(s)
-        response.append(extended)
 
-    return {"data": response}
+@router.get('/metrics', response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_prometheus(session_manager.pools(), query_cache.stats()), media_type='text/plain; version=0.0.4')
+
+
+@router.get('/stats', responses={200: {"model": StatsPage}})
+async def stats(
+        limit: int = Query(settings.STATS_PAGE_SIZE, ge=1, le=settings.STATS_MAX_PAGE_SIZE),
+        cursor: str = None,
+        format: str = None,
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    if format == 'ndjson':
+        return StreamingResponse(stream_stats_ndjson(limit), media_type='application/x-ndjson')
+
+    try:
+        data, next_cursor = await stats_service.get_stats_page(limit, cursor)
+    except InvalidCursorError as e:
+        return {"error": str(e)}
+
+    response = [stats_extended_row(row) for row in data]
+
+    return TimedORJSONResponse({"data": response, "next_cursor": next_cursor})
+
+
+@router.get('/export/stats')
+async def export_stats(
+        format: str = "arrow",
+        season: int = None,
+        players: str = None,
+        columns: str = None,
+        batch_size: int = Query(settings.EXPORT_BATCH_SIZE, ge=1, le=settings.EXPORT_MAX_BATCH_SIZE),
+):
+    try:
+        fields = export_fields(format, columns)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        stream_export(session_manager.read_session_factory, format, fields, season, parse_players(players), batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="stats.{extension}"'},
+    )
 
 
 @router.get('/players')
-async def stats(stats_service: StatsService = Depends()):
+async def stats(stats_service: StatsService = Depends(get_stats_service)):
     data = await stats_service.get_players()
-    return {"data": data}
+    return TimedORJSONResponse({"data": data})
+
+
+@router.get('/players/search')
+async def search_players(
+        q: str,
+        limit: int = Query(settings.PLAYER_SEARCH_LIMIT, ge=1, le=settings.PLAYER_SEARCH_MAX_LIMIT),
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    data = await stats_service.search_players(q, limit)
+    return TimedORJSONResponse({"data": data})
+
+
+@router.get('/players/{player_name}/career')
+async def career(player_name: str, stats_service: StatsService = Depends(get_stats_service)):
+    data = await stats_service.get_player_totals([player_name])
 
+    if not data:
+        return {"error": "Player not found."}
 
-@router.get('/stats/{player_name}')
-async def stats(player_name: str, stats_service: StatsService = Depends()):
-    response = []
+    return TimedORJSONResponse({"data": data[0]})
+
+
+@router.get('/stats/{player_name}', responses={200: {"model": StatsList}})
+async def stats(player_name: str, stats_service: StatsService = Depends(get_stats_service)):
     data = await stats_service.get_stats_by_player_name(player_name)
+    response = [stats_extended_row(row) for row in data]
+
+    return TimedORJSONResponse({"data": response})
+
 
-    for s in data:
-        extended = await stat_to_extended_model(s)
-        response.append(extended)
+# Charts taking a top-N limit; the scatter ones among them (SCATTER_CHARTS) can be downsampled instead
+LIMITED_CHARTS = {
+    'total-points': lambda service, season, player_list, limit: service.get_goals_assists_chart_data(season, player_list, limit),
+    'production': lambda service, season, player_list, limit: service.get_production_chart_data(season, player_list, limit),
+    'shooting-efficiency': lambda service, season, player_list, limit: service.get_shooting_efficiency_chart_data(season, player_list, limit),
+}
 
-    return {"data": response}
+
+def check_chart_size(chart: str, limit: Optional[int], downsample: Optional[str], bins: int) -> None:
+    # Only the size parameters the chart takes, within the bounds of the chart routes' query parameters
+    if limit is not None and chart not in LIMITED_CHARTS:
+        raise ValueError(f"limit only applies to: {', '.join(LIMITED_CHARTS)}.")
+    if limit is not None and not 1 <= limit <= settings.CHART_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {settings.CHART_MAX_LIMIT}.")
+    if downsample and chart not in SCATTER_CHARTS:
+        raise ValueError(f"downsample only applies to: {', '.join(SCATTER_CHARTS)}.")
+    if downsample and downsample not in DOWNSAMPLE_MODES:
+        raise ValueError(f"Unknown downsample mode, expected one of: {', '.join(DOWNSAMPLE_MODES)}.")
+    if not 1 <= bins <= settings.CHART_MAX_BINS:
+        raise ValueError(f"bins must be between 1 and {settings.CHART_MAX_BINS}.")
+
+
+async def chart_view(
+        stats_service: StatsService,
+        chart: str,
+        season: int = None,
+        player_list: List[str] = None,
+        limit: int = None,
+        downsample: str = None,
+        bins: int = settings.CHART_BINS,
+):
+    # A chart at the size check_chart_size accepted: a downsampled summary, the top `limit` rows or every row
+    if downsample:
+        return await stats_service.get_scatter_summary(chart, downsample, bins, season, player_list)
+    if limit:
+        return await LIMITED_CHARTS[chart](stats_service, season, player_list, limit)
+    return await BATCH_CHARTS[chart](stats_service, season, player_list)
 
 
 @router.get('/charts/total-points')
 async def total_points(
         season: int = None,
         players: str = None,
-        stats_service: StatsService = Depends()
+        limit: int = Query(None, ge=1, le=settings.CHART_MAX_LIMIT),
+        stats_service: StatsService = Depends(get_stats_service)
 ):
     player_list = parse_players(players)
-    data = await stats_service.get_goals_assists_chart_data(season, player_list)
-    return {"data": data}
+    data = await stats_service.get_goals_assists_chart_data(season, player_list, limit)
+    return TimedORJSONResponse({"data": data})
 
 
 @router.get('/charts/production')
 async def production(
         season: int = None,
         players: str = None,
-        stats_service: StatsService = Depends()
+        limit: int = Query(None, ge=1, le=settings.CHART_MAX_LIMIT),
+        downsample: str = None,
+        bins: int = Query(settings.CHART_BINS, ge=1, le=settings.CHART_MAX_BINS),
+        stats_service: StatsService = Depends(get_stats_service)
 ):
-    player_list = parse_players(players)
-    data = await stats_service.get_production_chart_data(season, player_list)
-    return {"data": data}
+    # downsample=bin|quantile returns a summary of the points instead of the points
+    try:
+        check_chart_size('production', limit, downsample, bins)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    data = await chart_view(stats_service, 'production', season, parse_players(players), limit, downsample, bins)
+    return TimedORJSONResponse({"data": data})
 
 
 @router.get('/charts/shooting-efficiency')
 async def shooting_efficiency(
         season: int = None,
         players: str = None,
-        stats_service: StatsService = Depends()
+        limit: int = Query(None, ge=1, le=settings.CHART_MAX_LIMIT),
+        downsample: str = None,
+        bins: int = Query(settings.CHART_BINS, ge=1, le=settings.CHART_MAX_BINS),
+        stats_service: StatsService = Depends(get_stats_service)
 ):
-    player_list = parse_players(players)
-    data = await stats_service.get_shooting_efficiency_chart_data(season, player_list)
-    return {"data": data}
+    # downsample=bin|quantile returns a summary of the points instead of the points
+    try:
+        check_chart_size('shooting-efficiency', limit, downsample, bins)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    data = await chart_view(stats_service, 'shooting-efficiency', season, parse_players(players), limit, downsample, bins)
+    return TimedORJSONResponse({"data": data})
 
 
 @router.get('/charts/per-game-consistency')
 async def per_game_consistency(
         season: int = None,
         players: str = None,
-        stats_service: StatsService = Depends()
+        stats_service: StatsService = Depends(get_stats_service)
 ):
     player_list = parse_players(players)
     data = await stats_service.get_per_game_consistency_chart_data(season, player_list)
-    return {"data": data}
+    return TimedORJSONResponse({"data": data})
 
 
 @router.get('/charts/scouting-heatmap')
-async def scouting_heatmap(stats_service: StatsService = Depends()):
+async def scouting_heatmap(stats_service: StatsService = Depends(get_stats_service)):
     data = await stats_service.get_scouting_heatmap_chart_data()
+    return TimedORJSONResponse({"data": data})
+
+
+@router.get('/charts/team-leaderboard')
+async def team_leaderboard(season: int = None, stats_service: StatsService = Depends(get_stats_service)):
+    data = await stats_service.get_team_leaderboard_data(season)
+    return TimedORJSONResponse({"data": data})
+
+
+# Charts that can be requested together through /charts/batch, all sharing the same filters
+BATCH_CHARTS = {
+    'total-points': lambda service, season, player_list: service.get_goals_assists_chart_data(season, player_list),
+    'production': lambda service, season, player_list: service.get_production_chart_data(season, player_list),
+    'shooting-efficiency': lambda service, season, player_list: service.get_shooting_efficiency_chart_data(season, player_list),
+    'per-game-consistency': lambda service, season, player_list: service.get_per_game_consistency_chart_data(season, player_list),
+    'scouting-heatmap': lambda service, season, player_list: service.get_scouting_heatmap_chart_data(),
+    'team-leaderboard': lambda service, season, player_list: service.get_team_leaderboard_data(season),
+}
+
+
+@router.get('/charts/batch')
+async def charts_batch(
+        charts: str,
+        season: int = None,
+        players: str = None,
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    # charts is a comma separated list of chart names.
+    # Everything runs on the one session, so a batch checks out a single pooled connection.
+    # Queries on one connection can't overlap, so the charts run one after another.
+    chart_names = list(dict.fromkeys(name.strip() for name in charts.split(',') if name.strip()))
+
+    unknown = [name for name in chart_names if name not in BATCH_CHARTS]
+    if unknown:
+        return {"error": f"Unknown charts: {', '.join(unknown)}. Available: {', '.join(BATCH_CHARTS)}"}
+
+    player_list = parse_players(players)
+    data = {}
+    for name in chart_names:
+        data[name] = await BATCH_CHARTS[name](stats_service, season, player_list)
+
+    return TimedORJSONResponse({"data": data})
+
+
+def live_topic(
+        chart: str,
+        season: int = None,
+        player_list: List[str] = None,
+        limit: int = None,
+        downsample: str = None,
+        bins: int = settings.CHART_BINS,
+):
+    # Subscriptions to the same chart, filters and size share one topic, whatever the player order
+    key = (chart, season or None, tuple(sorted(player_list or ())), limit, downsample, bins if downsample else None)
+
+    async def compute():
+        # Recomputed long after the subscribing request, so it opens its own session
+        async with session_manager.read_session_factory() as session:
+            return await chart_view(get_stats_service(session), chart, season, player_list, limit, downsample, bins)
+
+    return key, compute
+
+
+async def stream_live_chart(key, compute):
+    # Subscribes inside the stream, so a client gone before the first byte never leaves a subscriber behind
+    queue = await live_hub.subscribe(key, compute)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), settings.LIVE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # a comment line, keeps proxies from closing an idle stream
+                yield b': keepalive\n\n'
+                continue
+            yield b'data: ' + message + b'\n\n'
+    finally:
+        live_hub.unsubscribe(key, queue)
+
+
+@router.get('/live/charts/{chart}')
+async def live_chart(
+        chart: str,
+        season: int = None,
+        players: str = None,
+        limit: int = None,
+        downsample: str = None,
+        bins: int = settings.CHART_BINS,
+):
+    # Server-sent events: a snapshot of the chart, then a patch or snapshot whenever the data changes
+    if chart not in BATCH_CHARTS:
+        return {"error": f"Unknown chart: {chart}. Available: {', '.join(BATCH_CHARTS)}"}
+
+    try:
+        check_chart_size(chart, limit, downsample, bins)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return StreamingResponse(
+        stream_live_chart(*live_topic(chart, season, parse_players(players), limit, downsample, bins)),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache'},
+    )
+
+
+def request_int(request: dict, name: str) -> Optional[int]:
+    try:
+        return int(request[name]) if request.get(name) else None
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number.")
+
+
+@router.websocket('/live')
+async def live(websocket: WebSocket):
+    """
+    The same updates as /live/charts, for any number of charts over one socket. Clients send
+    {"action": "subscribe", "id": ..., "chart": ..., "season": ..., "players": "A|B"}, optionally with
+    the chart's "limit", "downsample" and "bins", and
+    {"action": "unsubscribe", "id": ...}; every message sent back carries the subscription's id.
+    """
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    subscriptions: Dict[str, asyncio.Task] = {}
+
+    async def send(subscription: str, message: bytes):
+        # one frame at a time, every subscription sends on the same socket
+        async with send_lock:
+            await websocket.send_text(tagged(message, subscription).decode())
+
+    async def forward(subscription: str, key, compute):
+        try:
+            queue = await live_hub.subscribe(key, compute)
+        except Exception as e:
+            await send(subscription, orjson.dumps({"type": "error", "error": str(e)}))
+            return
+
+        try:
+            while True:
+                await send(subscription, await queue.get())
+        finally:
+            live_hub.unsubscribe(key, queue)
+
+    try:
+        while True:
+            request = await websocket.receive_json()
+            subscription = str(request.get('id', ''))
+            action = request.get('action')
+
+            if subscription in subscriptions:
+                subscriptions.pop(subscription).cancel()
+
+            if action == 'subscribe':
+                chart = request.get('chart')
+                if chart not in BATCH_CHARTS:
+                    error = f"Unknown chart: {chart}. Available: {', '.join(BATCH_CHARTS)}"
+                    await send(subscription, orjson.dumps({"type": "error", "error": error}))
+                    continue
+
+                try:
+                    season = request_int(request, 'season')
+                    limit = request_int(request, 'limit')
+                    bins = request_int(request, 'bins') or settings.CHART_BINS
+                    downsample = request.get('downsample') or None
+                    check_chart_size(chart, limit, downsample, bins)
+                except ValueError as e:
+                    await send(subscription, orjson.dumps({"type": "error", "error": str(e)}))
+                    continue
+
+                key, compute = live_topic(chart, season, parse_players(request.get('players')), limit, downsample, bins)
+                subscriptions[subscription] = asyncio.create_task(forward(subscription, key, compute))
+            elif action != 'unsubscribe':
+                await send(subscription, orjson.dumps({"type": "error", "error": f"Unknown action: {action}"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in subscriptions.values():
+            task.cancel()
+        await asyncio.gather(*subscriptions.values(), return_exceptions=True)
+
+
+@router.post('/ingest/delta')
+async def ingest_delta(delta: StatsDelta, x_ingest_token: str = Header(None)):
+    # A write endpoint, for the feed holding INGEST_TOKEN only; without a token configured it is off
+    if not settings.INGEST_TOKEN:
+        return ORJSONResponse({"error": "Delta ingestion over HTTP is disabled, set INGEST_TOKEN to enable it."}, status_code=403)
+    if not x_ingest_token or not hmac.compare_digest(x_ingest_token.encode(), settings.INGEST_TOKEN.encode()):
+        return ORJSONResponse({"error": "A valid X-Ingest-Token header is required."}, status_code=401)
+
+    try:
+        columns = read_rows([row.model_dump() for row in delta.rows])
+        result = await apply_delta(session_manager.engine, columns, delta.source, session_manager.read_engine)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    return {"data": asdict(result)}
+
+
+@router.get('/changes')
+async def changes(
+        after: int = 0,
+        limit: int = Query(settings.STATS_PAGE_SIZE, ge=1, le=settings.STATS_MAX_PAGE_SIZE),
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    data = await stats_service.get_changes(after, limit)
+    next_after = data[-1]["id"] if len(data) == limit else None
+    return {"data": data, "next_after": next_after}
+
+
+@router.get('/summaries/status')
+async def summaries_status(stats_service: StatsService = Depends(get_stats_service)):
+    data = await stats_service.get_summary_status()
     return {"data": data}
 
 
@@ -100,13 +467,172 @@ async def scouting_heatmap(stats_service: StatsService = Depends()):
 async def head_to_head(
         season: int = None,
         players: str = None,
-        stats_service: StatsService = Depends()
+        stats_service: StatsService = Depends(get_stats_service)
 ):
     player_list = parse_players(players)
 
     if player_list is None or len(player_list) != 2:
         return {"error": "Please provide exactly two players."}
 
-    data = await stats_service.get_head_to_head_data(player_list, season)
+    try:
+        data = await stats_service.get_head_to_head_data(player_list, season)
+    except LookupError as e:
+        return {"error": str(e)}
+
+    return TimedORJSONResponse({"data": data})
+
+
+@router.get('/charts/comparison')
+async def comparison(
+        season: int = None,
+        players: str = None,
+        all_players: bool = False,
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    # Every player is an n x n comparison, too big to hold a request for; it runs as a job
+    job_hint = 'POST /jobs with {"kind": "comparison"}' if JOBS_ENABLED else "run a single worker (SERVER_WORKERS=1) and POST /jobs"
+    if all_players:
+        return {"error": f"Comparing every player runs as a background job, {job_hint}."}
+
+    player_list = parse_players(players)
+    if player_list is None or len(player_list) < 2:
+        return {"error": f"Please provide at least two players; to compare all of them, {job_hint}."}
+    if len(player_list) > settings.COMPARISON_MAX_PLAYERS:
+        return {"error": f"At most {settings.COMPARISON_MAX_PLAYERS} players can be compared here; for more, {job_hint}."}
+
+    try:
+        data = await stats_service.get_comparison_data(player_list, season)
+    except LookupError as e:
+        return {"error": str(e)}
+
+    return TimedORJSONResponse({"data": data})
+
+@router.get('/charts/trajectory')
+async def trajectory(
+        players: str = None,
+        metric: str = "points_per_game",
+        window: int = Query(3, ge=1, le=10),
+        all_players: bool = False,
+        season: int = None,
+        stats_service: StatsService = Depends(get_stats_service)
+):
+    if metric not in TRAJECTORY_METRICS:
+        return {"error": f"Unknown metric, expected one of: {', '.join(TRAJECTORY_METRICS)}."}
+
+    # League-wide mode: every player's percentile rank for the season, or over their career
+    if all_players:
+        data = await stats_service.get_percentile_ranks(metric, season)
+        return TimedORJSONResponse({"data": data})
+
+    player_list = parse_players(players)
+    if player_list is None:
+        return {"error": "Please provide at least one player, or all_players=true."}
+
+    try:
+        data = await stats_service.get_trajectory_data(player_list, metric, window)
+    except LookupError as e:
+        return {"error": str(e)}
+
+    return TimedORJSONResponse({"data": data})
+
+
+# Job kind -> the JobRequest fields it uses
+JOB_KINDS = {
+    'comparison': {'season', 'players'},
+    'percentiles': {'season', 'metric'},
+    'export': {'season', 'players', 'format', 'columns'},
+}
+
+
+def job_runner(request: JobRequest) -> Callable[[], Awaitable]:
+    """
+    Checks a job request up front, so a bad one is refused at submission, and returns what the
+    job runs. The job outlives the submitting request, so it opens its own session. Results are
+    kept serialized, which is also what the job queue counts against JOB_MAX_RESULT_BYTES.
+    """
+    player_list = parse_players(request.players)
+
+    if request.kind == 'comparison':
+        async def run():
+            async with session_manager.read_session_factory() as session:
+                data = await get_stats_service(session).get_comparison_data(player_list, request.season)
+            return await asyncio.to_thread(dumps, {"data": data})
+
+    elif request.kind == 'percentiles':
+        if request.metric not in TRAJECTORY_METRICS:
+            raise ValueError(f"Unknown metric, expected one of: {', '.join(TRAJECTORY_METRICS)}.")
+
+        async def run():
+            async with session_manager.read_session_factory() as session:
+                data = await get_stats_service(session).get_percentile_ranks(request.metric, request.season)
+            return await asyncio.to_thread(dumps, {"data": data})
+
+    elif request.kind == 'export':
+        fields = export_fields(request.format, request.columns)
+
+        async def run():
+            return await export_bytes(
+                session_manager.read_session_factory, request.format, fields, request.season, player_list,
+                max_bytes=job_queue.max_result_bytes,
+            )
+
+    else:
+        raise ValueError(f"Unknown job kind, expected one of: {', '.join(JOB_KINDS)}.")
+
+    return run
+
+
+@jobs_router.post('/jobs')
+async def submit_job(request: JobRequest):
+    # Heavy requests (every player's comparison, league-wide percentiles, full exports) run in the background
+    try:
+        run = job_runner(request)
+        params = request.model_dump(include=JOB_KINDS[request.kind], exclude_none=True)
+        job = job_queue.submit(request.kind, params, run)
+    except (ValueError, JobQueueFullError) as e:
+        return {"error": str(e)}
+
+    return TimedORJSONResponse({"data": job.describe()})
+
+
+@jobs_router.get('/jobs')
+async def jobs():
+    return TimedORJSONResponse({"data": [job.describe() for job in job_queue.all_jobs()]})
+
+
+@jobs_router.get('/jobs/{job_id}')
+async def job_status(job_id: str):
+    try:
+        job = job_queue.get(job_id)
+    except LookupError as e:
+        return {"error": str(e)}
+
+    return TimedORJSONResponse({"data": job.describe()})
+
+
+@jobs_router.get('/jobs/{job_id}/result')
+async def job_result(job_id: str):
+    try:
+        job = job_queue.get(job_id)
+    except LookupError as e:
+        return {"error": str(e)}
+
+    if job.status != 'done':
+        return {"error": job.error or f"The job is {job.status}."}
+
+    if job.kind == 'export':
+        media_type, extension = EXPORT_FORMATS[job.params['format']]
+        return Response(job.result, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="stats.{extension}"'})
+
+    return Response(job.result, media_type='application/json')
+
+
+@jobs_router.delete('/jobs/{job_id}')
+async def cancel_job(job_id: str):
+    # Stops a queued or running job, or discards a finished job's result
+    try:
+        job = await job_queue.cancel(job_id)
+    except LookupError as e:
+        return {"error": str(e)}
 
-    return {"data": data}
\ No newline at end of file
+    return TimedORJSONResponse({"data": job.describe()})
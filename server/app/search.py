@@ -0,0 +1,159 @@
+import asyncio
+import bisect
+import re
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlmodel import distinct, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import query_cache
+from app.models import Stats
+
+# Below this share of the query's trigrams found in a name, a fuzzy match is noise rather than a typo
+MIN_SIMILARITY = 0.5
+
+
+def normalize_tokens(text: str) -> List[str]:
+    # "Stützle, Tim" -> ["stutzle", "tim"]; accents, case and punctuation don't matter to a search
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def trigrams(token: str) -> List[str]:
+    padded = f"  {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class PlayerIndex:
+    """
+    In-memory search over the distinct player names, rebuilt when the data version moves.
+
+    Names are split into tokens, so "Last, First" matches in either order. Prefix matches come
+    from binary search over the sorted tokens of every name; when they don't fill the results,
+    names sharing enough trigrams with the query are added, which tolerates typos.
+    """
+
+    # What build() sets, swapped in together from an index built aside
+    BUILT = ('names', 'name_tokens', 'tokens', 'token_names', 'name_lengths', 'postings', 'trigram_counts')
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.name_tokens: List[List[str]] = []
+        self.tokens: List[str] = []
+        self.token_names = np.zeros(0, dtype=np.int32)
+        self.name_lengths = np.zeros(0, dtype=np.int32)
+        self.postings: Dict[str, np.ndarray] = {}
+        self.trigram_counts = np.zeros(0, dtype=np.int32)
+        self.state: Optional[Tuple[str, int]] = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_current(self) -> bool:
+        return self.state == query_cache.state
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self.is_current:
+            return
+
+        async with self.lock:
+            if self.is_current:
+                return
+
+            state = query_cache.state
+            result = await db.exec(select(distinct(Stats.player_name)).order_by(Stats.player_name))
+
+            # Building takes ~0.6 s at 50k names; in a thread, the event loop keeps serving other requests meanwhile
+            fresh = PlayerIndex()
+            await asyncio.to_thread(fresh.build, result.all())
+            for name in self.BUILT:
+                setattr(self, name, getattr(fresh, name))
+            self.state = state
+
+    def build(self, names: List[str]) -> None:
+        self.names = list(names)
+        self.name_tokens = [normalize_tokens(name) for name in self.names]
+        self.name_lengths = np.array([len(name) for name in self.names], dtype=np.int32)
+
+        # Every token of every name, sorted, alongside the id of the name it came from
+        pairs = sorted((token, i) for i, tokens in enumerate(self.name_tokens) for token in tokens)
+        self.tokens = [token for token, _ in pairs]
+        self.token_names = np.array([i for _, i in pairs], dtype=np.int32)
+
+        postings: Dict[str, List[int]] = {}
+        counts = []
+        for i, tokens in enumerate(self.name_tokens):
+            grams = {gram for token in tokens for gram in trigrams(token)}
+            counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.trigram_counts = np.array(counts, dtype=np.int32)
+
+    def prefixed(self, prefix: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ids of names with a token starting with the prefix, and of those with a token
+        equal to it (a name can appear twice). Matching tokens are a contiguous run of the sorted
+        token list, the exact ones at its start.
+        """
+        start = bisect.bisect_left(self.tokens, prefix)
+        exact_end = bisect.bisect_right(self.tokens, prefix)
+        end = bisect.bisect_left(self.tokens, prefix + '\uffff')
+        return self.token_names[start:end], self.token_names[start:exact_end]
+
+    def prefix_matches(self, query_tokens: List[str], limit: int) -> List[int]:
+        # Every query token must start some token of the name, in any order
+        ids = None
+        matched = []
+        for token in query_tokens:
+            prefixed, exact = self.prefixed(token)
+            ids = prefixed if ids is None else np.intersect1d(ids, prefixed)
+            matched.append(exact)
+            if not len(ids):
+                return []
+
+        # Whole-token matches first, then the shorter (closer) name, then alphabetical (= id order)
+        exact_count = sum(np.isin(ids, exact).astype(np.int32) for exact in matched)
+        order = np.lexsort((ids, self.name_lengths[ids], -exact_count))
+
+        top = []
+        for i in ids[order].tolist():
+            if not top or top[-1] != i:
+                top.append(i)
+                if len(top) == limit:
+                    break
+        return top
+
+    def fuzzy_matches(self, query_tokens: List[str], limit: int) -> List[Tuple[int, float]]:
+        grams = list({gram for token in query_tokens for gram in trigrams(token)})
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return []
+
+        # Score on how much of the query the name contains, so extra name tokens cost little;
+        # ties go to the name closest overall
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.names))
+        score = shared / len(grams)
+        overall = shared / (len(grams) + self.trigram_counts - shared)
+
+        candidates = np.flatnonzero(score >= MIN_SIMILARITY)
+        top = candidates[np.lexsort((-overall[candidates], -score[candidates]))[:limit]]
+        return [(int(i), float(score[i])) for i in top]
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        query_tokens = normalize_tokens(query)
+        if not query_tokens:
+            return []
+
+        results = [(i, 1.0) for i in self.prefix_matches(query_tokens, limit)]
+        if len(results) < limit:
+            seen = {i for i, _ in results}
+            fuzzy = self.fuzzy_matches(query_tokens, limit + len(seen))
+            results += [(i, score) for i, score in fuzzy if i not in seen][:limit - len(results)]
+
+        return [{"player_name": self.names[i], "score": round(score, 4)} for i, score in results]
+
+
+player_index = PlayerIndex()
@@ -1,12 +1,20 @@
-from typing import List
+import asyncio
+from typing import List, Optional, AsyncIterator
 
+import numpy as np
 from fastapi import Depends
-from sqlalchemy import func
+from sqlalchemy import Float, case, cast, func
 from sqlmodel import select, distinct
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app import settings
+from app.cache import cached
 from app.db import get_db
-from app.models import Stats
+from app.downsample import axis_bins, bin_cells, bin_expression, bin_summary, quantile_summary
+from app.engine import columnar_store
+from app.models import TEAM_MAPPING, STATS_EXTENDED_COLUMNS, Stats, SeasonGradeSummary, SeasonTeamSummary, PlayerCareerTotals, SummaryRefresh, StatsChange, StatsChangeSet
+from app.pagination import after_cursor, encode_cursor
+from app.search import player_index
 
 
 def build_query(fields, season: int = None, player_list: List[str] = None) -> select:
@@ -18,19 +26,250 @@ def build_query(fields, season: int = None, player_list: List[str] = None) -> se
 
     return query
 
+
+def top_n(query: select, limit: Optional[int]) -> select:
+    # The top-N is cut in SQL, where the (season, metric) and (metric) indexes can stop early
+    return query.limit(limit) if limit else query
+
+
+def player_totals_query(season: int = None, player_list: List[str] = None) -> select:
+    # One row per player: totals over the seasons matching the filters
+    fields = [
+        Stats.player_name,
+        func.count().label("seasons_included"),
+        func.sum(Stats.gp).label("total_games"),
+        func.sum(Stats.goals).label("total_goals"),
+        func.sum(Stats.assists).label("total_assists"),
+        func.sum(Stats.points).label("total_points"),
+        func.sum(Stats.shots).label("total_shots"),
+        func.sum(Stats.toi).label("total_toi"),
+        func.avg(Stats.scouting_grade).label("avg_scouting_grade"),
+    ]
+
+    query = build_query(fields, season, player_list)
+    return query.group_by(Stats.player_name).order_by(Stats.player_name)
+
+
+# Trajectory metrics as (numerator, denominator, scale), so multi-season values are games-weighted
+TRAJECTORY_METRICS = {
+    "points_per_game": (Stats.points, Stats.gp, 1),
+    "goals_per_game": (Stats.goals, Stats.gp, 1),
+    "assists_per_game": (Stats.assists, Stats.gp, 1),
+    "shots_per_game": (Stats.shots, Stats.gp, 1),
+    "toi_per_game": (Stats.toi, Stats.gp, 1),
+    "shooting_percentage": (Stats.goals, Stats.shots, 100),
+}
+
+
+def metric_ratio(numerator, denominator, scale: int):
+    # 0.0 for an empty denominator, as everywhere else in the API
+    return case((denominator > 0, cast(numerator, Float) * scale / cast(denominator, Float)), else_=0.0)
+
+
+def player_seasons_subquery(metric: str, player_list: List[str] = None, season: int = None):
+    # One row per player and season, teams combined, with the metric's summed numerator and denominator
+    numerator, denominator, scale = TRAJECTORY_METRICS[metric]
+    query = build_query([
+        Stats.player_name,
+        Stats.season,
+        func.sum(Stats.gp).label("gp"),
+        func.sum(numerator).label("numerator"),
+        func.sum(denominator).label("denominator"),
+    ], season, player_list)
+
+    return query.group_by(Stats.player_name, Stats.season).subquery()
+
+
+def trajectory_query(metric: str, window: int, player_list: List[str]) -> select:
+    """
+    Per player and season: the metric, its rolling average over the last `window` seasons and the
+    change from the previous season. The windows are partitioned by player, so only the
+    requested players' rows are read.
+    """
+    scale = TRAJECTORY_METRICS[metric][2]
+    seasons = player_seasons_subquery(metric, player_list)
+
+    value = metric_ratio(seasons.c.numerator, seasons.c.denominator, scale)
+    by_player = dict(partition_by=seasons.c.player_name, order_by=seasons.c.season)
+    last_seasons = dict(by_player, rows=(-(window - 1), 0))
+
+    return select(
+        seasons.c.player_name,
+        seasons.c.season,
+        seasons.c.gp,
+        value,
+        metric_ratio(
+            func.sum(seasons.c.numerator).over(**last_seasons),
+            func.sum(seasons.c.denominator).over(**last_seasons),
+            scale,
+        ),
+        value - func.lag(value).over(**by_player),
+    ).order_by(seasons.c.player_name, seasons.c.season)
+
+
+def season_values_query(metric: str, season: int) -> select:
+    # Every player's value in the season, to rank trajectories against
+    seasons = player_seasons_subquery(metric, season=season)
+    return select(metric_ratio(seasons.c.numerator, seasons.c.denominator, TRAJECTORY_METRICS[metric][2]))
+
+
+def percentile_ranks_query(metric: str, season: int = None) -> select:
+    # One row per player: the metric over the season (or career) and its percentile rank among all players
+    numerator, denominator, scale = TRAJECTORY_METRICS[metric]
+    query = build_query([
+        Stats.player_name,
+        func.sum(Stats.gp).label("gp"),
+        func.sum(numerator).label("numerator"),
+        func.sum(denominator).label("denominator"),
+    ], season)
+    totals = query.group_by(Stats.player_name).subquery()
+
+    value = metric_ratio(totals.c.numerator, totals.c.denominator, scale)
+    percentile = func.percent_rank(type_=Float).over(order_by=value)
+
+    return select(totals.c.player_name, totals.c.gp, value, percentile).order_by(percentile.desc(), totals.c.player_name)
+
+
+# Scatter charts that can be downsampled, as (x, y, column that must be > 0) like the full charts
+SCATTER_CHARTS = {
+    'production': ('toi_per_game', 'points_per_game', 'gp'),
+    'shooting-efficiency': ('shots', 'shooting_efficiency', 'shots'),
+}
+
+
+def scatter_summary(chart: str, mode: str, bins: int, total: int, cells: List[dict]) -> dict:
+    x, y, _ = SCATTER_CHARTS[chart]
+    return {"x": x, "y": y, "mode": mode, "bins": bins, "total": total, "cells": cells}
+
+
+def summarize_totals(row) -> dict:
+    player_name, seasons, total_games, total_goals, total_assists, total_points, total_shots, total_toi, avg_grade = row
+
+    return {
+        "name": player_name,
+        "seasons_included": seasons,
+        "total_games": total_games,
+        "total_goals": total_goals,
+        "total_assists": total_assists,
+        "total_points": total_points,
+        "total_shots": total_shots,
+        "points_per_game": round(total_points / total_games, 2) if total_games > 0 else 0,
+        "goals_per_game": round(total_goals / total_games, 2) if total_games > 0 else 0,
+        "assists_per_game": round(total_assists / total_games, 2) if total_games > 0 else 0,
+        "shooting_percentage": round((total_goals / total_shots) * 100, 1) if total_shots > 0 else 0,
+        "avg_toi_per_game": round(total_toi / total_games, 2) if total_games > 0 else 0,
+        "avg_scouting_grade": round(float(avg_grade), 1)
+    }
+
+
+def percentile_rows(rows) -> List[dict]:
+    return [
+        {
+            "name": row[0],
+            "gp": row[1],
+            "value": round(row[2], 2),
+            "percentile": round(row[3] * 100, 1),
+        }
+        for row in rows
+    ]
+
+
+def compare_players(names: np.ndarray, summaries: List[dict], season: Optional[int]) -> dict:
+    categories = ["total_points", "points_per_game", "shooting_percentage", "avg_scouting_grade"]
+
+    # win_matrix[i][j]: number of categories in which player i beats player j, at most len(categories)
+    win_matrix = np.zeros((len(names), len(names)), dtype=np.int8)
+    category_winners = {}
+    for category in categories:
+        category_values = np.array([summary[category] for summary in summaries])
+        win_matrix += category_values[:, None] > category_values[None, :]
+
+        best = category_values.max()
+        category_winners[category] = {
+            "winners": names[category_values == best].tolist(),
+            "value": best.item(),
+        }
+
+    # A pair goes to whoever wins more categories against the other
+    pairs_won = (win_matrix > win_matrix.T).sum(axis=1)
+    pairs_lost = (win_matrix < win_matrix.T).sum(axis=1)
+    pairs_tied = len(names) - 1 - pairs_won - pairs_lost
+    category_wins = win_matrix.sum(axis=1)
+
+    order = np.lexsort((names, -category_wins, -pairs_won))
+    ranking = [
+        {
+            "name": names[i].item(),
+            "pairs_won": pairs_won[i].item(),
+            "pairs_lost": pairs_lost[i].item(),
+            "pairs_tied": pairs_tied[i].item(),
+            "category_wins": category_wins[i].item(),
+        }
+        for i in order
+    ]
+
+    return {
+        "players": names.tolist(),
+        "summaries": summaries,
+        "category_winners": category_winners,
+        "win_matrix": win_matrix.tolist() if len(names) <= settings.COMPARISON_MAX_PLAYERS else None,
+        "ranking": ranking,
+        "season_filter": season
+    }
+
+
 class BaseService:
     def __init__(self, db: AsyncSession = Depends(get_db)):
         self.db = db
 
 
 class StatsService(BaseService):
-    async def get_stats(self):
-        # Query to select all rows from the 'Stats' table
-        # Normally, we would want to be more methodical about this, with limits/pagination for example
-        # for this demonstration, we'll use a simple select statement since we know the data
-        query = select(Stats).order_by(Stats.player_name, Stats.season.desc())
-        result = await self.db.exec(query)
-        return result.all()
+    async def get_stats_page(self, limit: int, cursor: Optional[str] = None):
+        """
+        Returns one page of the 'Stats' table ordered by (player_name, season desc, id),
+        along with the cursor for the next page (None on the last page).
+        """
+        query = select(*STATS_EXTENDED_COLUMNS).order_by(Stats.player_name, Stats.season.desc(), Stats.id)
+
+        condition = after_cursor(cursor)
+        if condition is not None:
+            query = query.where(condition)
+
+        result = await self.db.exec(query.limit(limit))
+        data = result.all()
+
+        next_cursor = encode_cursor(data[-1]) if len(data) == limit else None
+        return data, next_cursor
+
+    async def iter_stats(self, batch_size: int) -> AsyncIterator[list]:
+        # Walks the whole table page by page, only one page is held at a time
+        cursor = None
+        while True:
+            data, cursor = await self.get_stats_page(batch_size, cursor)
+            if data:
+                yield data
+            if cursor is None:
+                break
+
+    async def iter_filtered_stats(
+            self,
+            columns: list,
+            season: int = None,
+            player_list: List[str] = None,
+            batch_size: int = settings.EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[list]:
+        # Pages through build_query's rows in id order, id first in each row; one page is held at a time
+        last_id = 0
+        while True:
+            query = build_query([Stats.id, *columns], season, player_list).where(Stats.id > last_id)
+            result = await self.db.exec(query.order_by(Stats.id).limit(batch_size))
+            page = result.all()
+
+            if page:
+                yield page
+            if len(page) < batch_size:
+                break
+            last_id = page[-1][0]
 
     async def get_players(self):
         # Returns a list of distinct player names from the 'Stats' table
@@ -38,12 +277,17 @@ class StatsService(BaseService):
         result = await self.db.exec(query)
         return result.all()
 
+    async def search_players(self, query: str, limit: int):
+        await player_index.ensure_loaded(self.db)
+        return player_index.search(query, limit)
+
     async def get_stats_by_player_name(self, player_name: str):
-        query = select(Stats).where(Stats.player_name == player_name)
+        query = select(*STATS_EXTENDED_COLUMNS).where(Stats.player_name == player_name)
         result = await self.db.exec(query)
         return result.all()
 
-    async def get_goals_assists_chart_data(self, season: int = None, player_list: List[str] = None):
+    @cached(unordered=['player_list'])
+    async def get_goals_assists_chart_data(self, season: int = None, player_list: List[str] = None, limit: int = None):
         fields = [
             Stats.player_name,
             Stats.team,
@@ -54,7 +298,8 @@ class StatsService(BaseService):
         ]
 
         query = build_query(fields, season, player_list)
-        result = await self.db.exec(query.order_by(Stats.points.desc()))
+        query = query.order_by(Stats.points.desc(), Stats.id)
+        result = await self.db.exec(top_n(query, limit))
 
         data = [
             {
@@ -70,50 +315,49 @@ class StatsService(BaseService):
 
         return data
 
-    async def get_production_chart_data(self, season: int = None, player_list: List[str] = None):
-        toi_per_game = (Stats.toi / Stats.gp).label("toi_per_game")
-        points_per_game = (Stats.points / Stats.gp).label("points_per_game")
-
+    @cached(unordered=['player_list'])
+    async def get_production_chart_data(self, season: int = None, player_list: List[str] = None, limit: int = None):
         fields = [
             Stats.player_name,
             Stats.team,
             Stats.season,
-            toi_per_game,
-            points_per_game
+            Stats.toi_per_game,
+            Stats.points_per_game
         ]
 
         query = build_query(fields, season, player_list)
         query = query.where(Stats.gp > 0)
-        result = await self.db.exec(query.order_by(points_per_game.desc()))
+        query = query.order_by(Stats.points_per_game.desc(), Stats.id)
+        result = await self.db.exec(top_n(query, limit))
 
         data = [
             {
                 "player_name": row[0],
                 "team": row[1],
                 "season": row[2],
-                "toi_per_game": round(row[3], 2) if row[3] is not None else 0,
-                "points_per_game": round(row[4], 2) if row[4] is not None else 0
+                "toi_per_game": row[3],
+                "points_per_game": row[4]
             }
             for row in result.all()
         ]
 
         return data
 
-    async def get_shooting_efficiency_chart_data(self, season: int = None, player_list: List[str] = None):
-        shooting_efficiency = (Stats.goals / Stats.shots).label("shooting_efficiency")
-
+    @cached(unordered=['player_list'])
+    async def get_shooting_efficiency_chart_data(self, season: int = None, player_list: List[str] = None, limit: int = None):
         fields = [
             Stats.player_name,
             Stats.team,
             Stats.season,
             Stats.goals,
             Stats.shots,
-            shooting_efficiency
+            Stats.shooting_efficiency
         ]
 
         query = build_query(fields, season, player_list)
         query = query.where(Stats.shots > 0)
-        result = await self.db.exec(query.order_by(shooting_efficiency.desc()))
+        query = query.order_by(Stats.shooting_efficiency.desc(), Stats.id)
+        result = await self.db.exec(top_n(query, limit))
 
         data = [
             {
@@ -122,53 +366,91 @@ class StatsService(BaseService):
                 "season": row[2],
                 "goals": row[3],
                 "shots": row[4],
-                "shooting_efficiency": round(row[5], 4) if row[5] is not None else 0,
+                "shooting_efficiency": row[5],
             }
             for row in result.all()
         ]
 
         return data
 
-    async def get_per_game_consistency_chart_data(self, season: int = None, player_list: List[str] = None):
-        goals_per_game = (Stats.goals / Stats.gp).label("goals_per_game")
-        assists_per_game = (Stats.assists / Stats.gp).label("assists_per_game")
-        shots_per_game = (Stats.shots / Stats.gp).label("shots_per_game")
-        toi_per_game = (Stats.toi / Stats.gp).label("toi_per_game")
+    @cached(unordered=['player_list'])
+    async def get_scatter_summary(
+            self,
+            chart: str,
+            mode: str = "bin",
+            bins: int = settings.CHART_BINS,
+            season: int = None,
+            player_list: List[str] = None,
+    ):
+        """
+        Downsamples a scatter chart to at most bins x bins grid cells ('bin') or bins x ranges
+        with y quantiles ('quantile'), so the payload is set by the chart's resolution rather
+        than by the number of rows. The grid is counted in SQL; quantiles need the points.
+        """
+        x, y, condition = (getattr(Stats, name) for name in SCATTER_CHARTS[chart])
+        condition = condition > 0
+
+        if mode == 'quantile':
+            result = await self.db.exec(build_query([x, y], season, player_list).where(condition))
+            rows = result.all()
+            xs, ys = (np.array(values, dtype=float) for values in zip(*rows)) if rows else (np.zeros(0), np.zeros(0))
+            return scatter_summary(chart, mode, bins, len(rows), quantile_summary(xs, ys, bins))
+
+        bounds = build_query([func.count(), func.min(x), func.max(x), func.min(y), func.max(y)], season, player_list)
+        result = await self.db.exec(bounds.where(condition))
+        total, x_min, x_max, y_min, y_max = result.one()
+        if not total:
+            return scatter_summary(chart, mode, bins, 0, [])
+
+        x_axis = axis_bins(x_min, x_max, bins)
+        y_axis = axis_bins(y_min, y_max, bins)
+        x_bin = bin_expression(x, *x_axis, bins).label('x_bin')
+        y_bin = bin_expression(y, *y_axis, bins).label('y_bin')
 
+        query = build_query([x_bin, y_bin, func.count()], season, player_list).where(condition)
+        result = await self.db.exec(query.group_by(x_bin, y_bin).order_by(x_bin, y_bin))
+        x_bins, y_bins, counts = zip(*result.all())
+
+        return scatter_summary(chart, mode, bins, total, bin_cells(x_bins, y_bins, counts, x_axis, y_axis))
+
+    @cached(unordered=['player_list'])
+    async def get_per_game_consistency_chart_data(self, season: int = None, player_list: List[str] = None):
         fields = [
             Stats.player_name,
             Stats.team,
             Stats.season,
-            goals_per_game,
-            assists_per_game,
-            shots_per_game,
-            toi_per_game,
+            Stats.goals_per_game,
+            Stats.assists_per_game,
+            Stats.shots_per_game,
+            Stats.toi_per_game,
         ]
 
         query = build_query(fields, season, player_list)
-        result = await self.db.exec(query)
+        result = await self.db.exec(query.order_by(Stats.id))
 
         data = [
             {
                 "player_name": row[0],
                 "team": row[1],
                 "season": row[2],
-                "goals_per_game": round(row[3], 2) if row[3] is not None else 0,
-                "assists_per_game": round(row[4], 2) if row[4] is not None else 0,
-                "shots_per_game": round(row[5], 2) if row[5] is not None else 0,
-                "toi_per_game": round(row[6], 2) if row[6] is not None else 0,
+                "goals_per_game": row[3],
+                "assists_per_game": row[4],
+                "shots_per_game": row[5],
+                "toi_per_game": row[6],
             }
             for row in result.all()
         ]
 
         return data
 
+    @cached()
     async def get_scouting_heatmap_chart_data(self):
+        # Read from the season x grade summary table, so the cost doesn't grow with history
         query = select(
-            Stats.season,
-            Stats.scouting_grade,
-            func.avg(Stats.points).label("average_points")
-        ).group_by(Stats.season, Stats.scouting_grade)
+            SeasonGradeSummary.season,
+            SeasonGradeSummary.scouting_grade,
+            SeasonGradeSummary.average_points
+        ).order_by(SeasonGradeSummary.season, SeasonGradeSummary.scouting_grade)
 
         result = await self.db.exec(query)
 
@@ -182,6 +464,75 @@ class StatsService(BaseService):
         ]
         return data
 
+    @cached()
+    async def get_team_leaderboard_data(self, season: int = None):
+        query = select(SeasonTeamSummary)
+        if season:
+            query = query.where(SeasonTeamSummary.season == season)
+
+        result = await self.db.exec(query.order_by(SeasonTeamSummary.total_points.desc(), SeasonTeamSummary.team))
+
+        return [
+            {
+                **row.model_dump(),
+                "team_full_name": TEAM_MAPPING.get(row.team, "Unknown Team"),
+            }
+            for row in result.all()
+        ]
+
+    async def get_summary_status(self):
+        result = await self.db.exec(select(SummaryRefresh).order_by(SummaryRefresh.summary))
+        return result.all()
+
+    async def get_changes(self, after: int, limit: int):
+        """
+        Returns the change log in the order changes were applied, starting after change id `after`.
+        """
+        query = select(
+            StatsChange.id,
+            StatsChange.version,
+            StatsChangeSet.applied_at,
+            StatsChangeSet.source,
+            StatsChange.season,
+            StatsChange.player_name,
+            StatsChange.team,
+            StatsChange.operation,
+        ).join(StatsChangeSet, StatsChangeSet.version == StatsChange.version)
+        query = query.where(StatsChange.id > after).order_by(StatsChange.id).limit(limit)
+
+        result = await self.db.exec(query)
+        return [
+            {
+                "id": row[0],
+                "version": row[1],
+                "applied_at": row[2],
+                "source": row[3],
+                "season": row[4],
+                "player_name": row[5],
+                "team": row[6],
+                "operation": row[7],
+            }
+            for row in result.all()
+        ]
+
+    @cached(unordered=['player_list'])
+    async def get_player_totals(self, player_list: List[str] = None, season: int = None):
+        """
+        Per-player totals aggregated in the database, one row per player.
+        Without a season filter these are career-to-date totals, read from the career summary table.
+        """
+        if season:
+            query = player_totals_query(season, player_list)
+        else:
+            query = select(*PlayerCareerTotals.__table__.columns).order_by(PlayerCareerTotals.player_name)
+            if player_list:
+                query = query.where(PlayerCareerTotals.player_name.in_(player_list))
+
+        result = await self.db.exec(query)
+        return [summarize_totals(row) for row in result.all()]
+
+    # player order decides player1/player2 in the response, so it is part of the key
+    @cached()
     async def get_head_to_head_data(self, player_list: List[str], season: int = None):
         """
         Method that retrieves data for two players and compares their stats,
@@ -193,46 +544,13 @@ class StatsService(BaseService):
 
         player1, player2 = player_list
 
-        query = select(Stats).where(Stats.player_name.in_([player1, player2]))
-        if season:
-            query = query.where(Stats.season == season)
+        totals = {summary["name"]: summary for summary in await self.get_player_totals(player_list, season)}
 
-        result = await self.db.exec(query)
-        stats = result.all()
-
-        player1_stats = [s for s in stats if s.player_name == player1]
-        player2_stats = [s for s in stats if s.player_name == player2]
-
-        if not player1_stats or not player2_stats:
-            raise BaseException("One or both players not found for the specified criteria")
-
-        def calculate_player_stats(player_stats, player_name):
-            total_goals = sum(s.goals for s in player_stats)
-            total_assists = sum(s.assists for s in player_stats)
-            total_points = sum(s.points for s in player_stats)
-            total_games = sum(s.gp for s in player_stats)
-            total_shots = sum(s.shots for s in player_stats)
-            total_toi = sum(s.toi for s in player_stats)
-            avg_scouting_grade = sum(s.scouting_grade for s in player_stats) / len(player_stats)
-
-            return {
-                "name": player_name,
-                "seasons_included": len(player_stats),
-                "total_games": total_games,
-                "total_goals": total_goals,
-                "total_assists": total_assists,
-                "total_points": total_points,
-                "total_shots": total_shots,
-                "points_per_game": round(total_points / total_games, 2) if total_games > 0 else 0,
-                "goals_per_game": round(total_goals / total_games, 2) if total_games > 0 else 0,
-                "assists_per_game": round(total_assists / total_games, 2) if total_games > 0 else 0,
-                "shooting_percentage": round((total_goals / total_shots) * 100, 1) if total_shots > 0 else 0,
-                "avg_toi_per_game": round(total_toi / total_games, 2) if total_games > 0 else 0,
-                "avg_scouting_grade": round(avg_scouting_grade, 1)
-            }
+        if player1 not in totals or player2 not in totals:
+            raise LookupError("One or both players not found for the specified criteria")
 
-        player1_summary = calculate_player_stats(player1_stats, player1)
-        player2_summary = calculate_player_stats(player2_stats, player2)
+        player1_summary = totals[player1]
+        player2_summary = totals[player2]
 
         comparisons = {
             "total_points": {
@@ -268,3 +586,166 @@ class StatsService(BaseService):
             "season_filter": season
         }
 
+    @cached()
+    async def get_season_values(self, metric: str, season: int) -> np.ndarray:
+        # Every player's value that season, sorted; scoped to the season, so deltas to other seasons keep it
+        result = await self.db.exec(season_values_query(metric, season))
+        return np.sort(np.array(result.all(), dtype=np.float64))
+
+    @cached(unordered=['player_list'])
+    async def get_player_trajectories(self, player_list: List[str], metric: str = "points_per_game", window: int = 3):
+        # The players' own rows only, so the cache scope (their seasons and names) covers them
+        result = await self.db.exec(trajectory_query(metric, window, player_list))
+        return [tuple(row) for row in result.all()]
+
+    async def get_trajectory_data(self, player_list: List[str], metric: str = "points_per_game", window: int = 3):
+        """
+        Season-by-season trajectory per player: the metric, its rolling `window`-season average,
+        the year-over-year delta and the league percentile that season.
+        The percentile matches SQL's percent_rank over all players that season. It depends on
+        every player, so it is looked up on each call rather than cached with the players' rows.
+        """
+        rows = await self.get_player_trajectories(player_list, metric, window)
+
+        missing = sorted(set(player_list) - {row[0] for row in rows})
+        if missing:
+            raise LookupError(f"Players not found: {', '.join(missing)}")
+
+        season_values = {season: await self.get_season_values(metric, season) for season in sorted({row[1] for row in rows})}
+
+        players = {}
+        for player_name, season, gp, value, rolling_value, delta in rows:
+            league = season_values[season]
+            below = np.searchsorted(league, value, side='left')
+            percentile = below / (len(league) - 1) if len(league) > 1 else 0.0
+
+            players.setdefault(player_name, []).append({
+                "season": season,
+                "gp": gp,
+                "value": round(value, 2),
+                "rolling_value": round(rolling_value, 2),
+                "delta": round(delta, 2) if delta is not None else None,
+                "percentile": round(float(percentile) * 100, 1),
+            })
+
+        return [{"name": name, "metric": metric, "window": window, "seasons": seasons} for name, seasons in players.items()]
+
+    @cached()
+    async def get_percentile_ranks(self, metric: str = "points_per_game", season: int = None):
+        # Every player's percentile rank on the metric, for a season or (without one) over their career
+        result = await self.db.exec(percentile_ranks_query(metric, season))
+        # A row per player in the league, built off the event loop
+        return await asyncio.to_thread(percentile_rows, result.all())
+
+    @cached(unordered=['player_list'])
+    async def get_comparison_data(self, player_list: Optional[List[str]] = None, season: int = None):
+        """
+        N-way version of the head-to-head: every player is compared against every other player
+        on the same categories, in one query and one vectorized pass.
+        With no player_list, every player (in the season, if given) is included. Past
+        COMPARISON_MAX_PLAYERS the pairwise win matrix is left out of the result.
+        """
+        summaries = await self.get_player_totals(player_list, season)
+        names = np.array([summary["name"] for summary in summaries], dtype=str)
+
+        if player_list:
+            missing = sorted(set(player_list) - set(names.tolist()))
+            if missing:
+                raise LookupError(f"Players not found for the specified criteria: {', '.join(missing)}")
+        if len(names) < 2:
+            raise LookupError("At least two players are required for comparison")
+
+        # The n x n pass is CPU-bound, so it runs off the event loop
+        return await asyncio.to_thread(compare_players, names, summaries, season)
+
+
+class ColumnarStatsService(StatsService):
+    """
+    Answers the chart queries from the in-memory columnar store instead of the database.
+    Results match the SQL path; rows that tie on the sort key come back in id order.
+    """
+
+    async def get_goals_assists_chart_data(self, season: int = None, player_list: List[str] = None, limit: int = None):
+        await columnar_store.ensure_loaded(self.db)
+
+        index = columnar_store.sorted_desc(columnar_store.mask(season, player_list), 'points')[:limit]
+        fields = ['player_name', 'team', 'season', 'goals', 'assists', 'points']
+
+        return columnar_store.records(index, fields)
+
+    async def get_production_chart_data(self, season: int = None, player_list: List[str] = None, limit: int = None):
+        await columnar_store.ensure_loaded(self.db)
+
+        selected = columnar_store.mask(season, player_list) & (columnar_store.columns['gp'] > 0)
+        index = columnar_store.sorted_desc(selected, 'points_per_game')[:limit]
+        fields = ['player_name', 'team', 'season', 'toi_per_game', 'points_per_game']
+
+        return columnar_store.records(index, fields)
+
+    async def get_shooting_efficiency_chart_data(self, season: int = None, player_list: List[str] = None, limit: int = None):
+        await columnar_store.ensure_loaded(self.db)
+
+        selected = columnar_store.mask(season, player_list) & (columnar_store.columns['shots'] > 0)
+        index = columnar_store.sorted_desc(selected, 'shooting_efficiency')[:limit]
+        fields = ['player_name', 'team', 'season', 'goals', 'shots', 'shooting_efficiency']
+
+        return columnar_store.records(index, fields)
+
+    async def get_scatter_summary(
+            self,
+            chart: str,
+            mode: str = "bin",
+            bins: int = settings.CHART_BINS,
+            season: int = None,
+            player_list: List[str] = None,
+    ):
+        await columnar_store.ensure_loaded(self.db)
+
+        x, y, condition = (columnar_store.columns[name] for name in SCATTER_CHARTS[chart])
+        selected = np.flatnonzero(columnar_store.mask(season, player_list) & (condition > 0))
+        xs = x[selected].astype(float)
+        ys = y[selected].astype(float)
+
+        summarize = quantile_summary if mode == 'quantile' else bin_summary
+        return scatter_summary(chart, mode, bins, len(selected), summarize(xs, ys, bins))
+
+    async def get_per_game_consistency_chart_data(self, season: int = None, player_list: List[str] = None):
+        await columnar_store.ensure_loaded(self.db)
+
+        index = np.flatnonzero(columnar_store.mask(season, player_list))
+        fields = [
+            'player_name',
+            'team',
+            'season',
+            'goals_per_game',
+            'assists_per_game',
+            'shots_per_game',
+            'toi_per_game',
+        ]
+
+        return columnar_store.records(index, fields)
+
+    async def get_scouting_heatmap_chart_data(self):
+        await columnar_store.ensure_loaded(self.db)
+
+        columns = columnar_store.columns
+        keys = np.stack([columns['season'], columns['scouting_grade']], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        average_points = np.bincount(inverse, weights=columns['points']) / np.bincount(inverse)
+
+        return [
+            {
+                "season": season,
+                "scouting_grade": scouting_grade,
+                "average_points": round(average, 2)
+            }
+            for (season, scouting_grade), average in zip(groups.tolist(), average_points.tolist())
+        ]
+
+
+def get_stats_service(db: AsyncSession = Depends(get_db)) -> StatsService:
+    if settings.STATS_ENGINE == 'columnar':
+        return ColumnarStatsService(db)
+    return StatsService(db)
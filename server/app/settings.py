@@ -11,6 +11,99 @@ DB_NAME = os.getenv("DB_NAME", "stats_tool")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 
+# Storage backend: "postgres", or "sqlite" for a local file that needs no database server
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres")
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "stats.db")
+
+# Postgres read replica for chart reads, empty sends reads to the primary
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST", "")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+
 # Frontend
 WEB_APP_URL = os.getenv('WEB_APP_URL', "http://localhost:5173")
 
+# Pagination
+STATS_PAGE_SIZE = int(os.getenv("STATS_PAGE_SIZE", "500"))
+STATS_MAX_PAGE_SIZE = int(os.getenv("STATS_MAX_PAGE_SIZE", "5000"))
+
+# Arrow / Parquet exports, rows per record batch (a Parquet row group)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+EXPORT_MAX_BATCH_SIZE = int(os.getenv("EXPORT_MAX_BATCH_SIZE", "100000"))
+
+# Chart sizes: the most rows a top-N chart returns, and the grid of downsampled scatter charts
+CHART_MAX_LIMIT = int(os.getenv("CHART_MAX_LIMIT", "10000"))
+CHART_BINS = int(os.getenv("CHART_BINS", "40"))
+CHART_MAX_BINS = int(os.getenv("CHART_MAX_BINS", "200"))
+# Players /charts/comparison takes at once, larger comparisons run as jobs and leave out the win matrix
+COMPARISON_MAX_PLAYERS = int(os.getenv("COMPARISON_MAX_PLAYERS", "200"))
+
+# Live chart updates (/live): messages buffered per subscriber before a slow one is resynced with a snapshot,
+# topics recomputed at once after a data change, and the SSE keep-alive interval.
+# Results longer than LIVE_PATCH_MAX_ROWS are sent as snapshots, diffing them would cost more than it saves
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "16"))
+LIVE_PATCH_MAX_ROWS = int(os.getenv("LIVE_PATCH_MAX_ROWS", "20000"))
+LIVE_REFRESH_CONCURRENCY = int(os.getenv("LIVE_REFRESH_CONCURRENCY", "4"))
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+
+# Background jobs (/jobs): how many run at once, how long a finished job's result is kept,
+# how many jobs (running or finished) a worker holds before refusing new ones,
+# and the most result bytes it holds before dropping the oldest results
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "600"))
+JOB_MAX_JOBS = int(os.getenv("JOB_MAX_JOBS", "100"))
+JOB_MAX_RESULT_BYTES = int(os.getenv("JOB_MAX_RESULT_BYTES", str(256 * 1024 * 1024)))
+
+# Player search results
+PLAYER_SEARCH_LIMIT = int(os.getenv("PLAYER_SEARCH_LIMIT", "10"))
+PLAYER_SEARCH_MAX_LIMIT = int(os.getenv("PLAYER_SEARCH_MAX_LIMIT", "50"))
+
+# Ingestion
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "10000"))
+# Shared secret POST /ingest/delta requires as "X-Ingest-Token: <token>", empty turns the endpoint off
+INGEST_TOKEN = os.getenv("INGEST_TOKEN", "")
+
+# Query result cache, 0 disables it. Each worker process holds its own; across SERVER_WORKERS only
+# the columnar engine's snapshot (SNAPSHOT_DIR) is shared
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "256"))
+
+# HTTP caching and compression
+HTTP_CACHE_CONTROL = os.getenv("HTTP_CACHE_CONTROL", "no-cache")
+COMPRESSION = os.getenv("COMPRESSION", "gzip") # gzip, br or none
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+
+# Chart engine, "sql" queries the database, "columnar" answers from in-memory NumPy columns
+STATS_ENGINE = os.getenv("STATS_ENGINE", "sql")
+
+# Connection pool, per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1")) # seconds, -1 never recycles
+# Pinging on every checkout costs a round-trip; with it off, DB_POOL_RECYCLE keeps connections fresh
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Prepared statements kept per connection, the chart queries are a small fixed set
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# Profiling, adds Server-Timing headers, per-route phase metrics and the X-Profile request trigger
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/stats-tool-profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001")) # seconds
+# Shared secret a request sends as "X-Profile: <token>" to be stack-sampled, empty turns the trigger off
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+# Serving
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1")) # more than 1 turns reload off
+SERVER_RELOAD = os.getenv("SERVER_RELOAD", "true").lower() == "true"
+# How often each worker checks the shared data version for writes made elsewhere
+DATA_VERSION_POLL_SECONDS = float(os.getenv("DATA_VERSION_POLL_SECONDS", "2"))
+# Directory for the shared columnar snapshot, empty keeps the columns private to each worker
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+
+
+# Startup. FAST_START serves the health probes at once and initializes in the background,
+# /health/ready turns 200 when done. Seeding on startup defaults to off then, use `python ingest.py --seed`
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+SEED_ON_STARTUP = os.getenv("SEED_ON_STARTUP", "false" if FAST_START else "true").lower() == "true"
+# Fills the query cache with every chart's default and per-season views before reporting ready;
+# with several workers only one does, the others start with an empty cache
+CACHE_PREWARM = os.getenv("CACHE_PREWARM", "false").lower() == "true"
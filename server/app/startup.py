@@ -0,0 +1,72 @@
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlmodel import distinct, select
+
+from app import settings
+from app.db import session_manager
+from app.models import Stats
+from app.service import get_stats_service
+
+
+class StartupState:
+    """
+    Where this process is in its startup, for the health probes. A process is live as soon
+    as it answers, unless startup failed, and ready once the database is initialized and any
+    warm-up it was asked for is done.
+    """
+
+    def __init__(self) -> None:
+        self.phase = 'starting'
+        self.error: Optional[str] = None
+        self.warmed = 0
+        self.warm_total = 0
+        self.started_at = time.monotonic()
+        self.ready_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.phase == 'ready'
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def enter(self, phase: str) -> None:
+        self.phase = phase
+        if phase == 'ready':
+            self.ready_seconds = round(time.monotonic() - self.started_at, 3)
+
+    def fail(self, error: Exception) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    def status(self) -> dict:
+        return {
+            "status": "failed" if self.failed else self.phase,
+            "error": self.error,
+            "prewarm": {"done": self.warmed, "total": self.warm_total},
+            "seconds": self.ready_seconds if self.ready else round(time.monotonic() - self.started_at, 3),
+        }
+
+
+startup_state = StartupState()
+
+
+async def prewarm_charts(charts: Dict[str, Callable[..., Awaitable]]) -> None:
+    """
+    Computes every chart's unfiltered view, then each season's, newest first, so the first
+    dashboards after a deploy hit a warm query cache. Progress shows in the startup state.
+
+    Only as many views as the cache holds are computed, and in reverse, so the most requested
+    ones are the most recently used and the last the LRU would evict.
+    """
+    async with session_manager.read_session_factory() as session:
+        result = await session.exec(select(distinct(Stats.season)).order_by(Stats.season.desc()))
+        views = [(name, season) for season in [None, *result.all()] for name in charts]
+        views = views[:settings.QUERY_CACHE_MAX_ENTRIES][::-1]
+        startup_state.warm_total = len(views)
+
+        stats_service = get_stats_service(session)
+        for name, season in views:
+            await charts[name](stats_service, season, None)
+            startup_state.warmed += 1
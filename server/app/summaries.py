@@ -0,0 +1,105 @@
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models import Stats, SeasonGradeSummary, SeasonTeamSummary, PlayerCareerTotals, SummaryRefresh
+
+# Bound on IN (...) lists when refreshing many players at once
+KEY_CHUNK_SIZE = 1000
+
+
+def season_grade_select():
+    return select(
+        Stats.season,
+        Stats.scouting_grade,
+        func.count(),
+        func.sum(Stats.points),
+        func.avg(Stats.points),
+    ).group_by(Stats.season, Stats.scouting_grade)
+
+
+def season_team_select():
+    return select(
+        Stats.season,
+        Stats.team,
+        func.count(func.distinct(Stats.player_name)),
+        func.sum(Stats.gp),
+        func.sum(Stats.goals),
+        func.sum(Stats.assists),
+        func.sum(Stats.points),
+        func.sum(Stats.shots),
+    ).group_by(Stats.season, Stats.team)
+
+
+def player_career_select():
+    return select(
+        Stats.player_name,
+        func.count(),
+        func.sum(Stats.gp),
+        func.sum(Stats.goals),
+        func.sum(Stats.assists),
+        func.sum(Stats.points),
+        func.sum(Stats.shots),
+        func.sum(Stats.toi),
+        func.avg(Stats.scouting_grade),
+    ).group_by(Stats.player_name)
+
+
+# summary table, its grouping query, and the 'Stats' column that scopes an incremental refresh
+SUMMARIES = [
+    (SeasonGradeSummary, season_grade_select, Stats.season),
+    (SeasonTeamSummary, season_team_select, Stats.season),
+    (PlayerCareerTotals, player_career_select, Stats.player_name),
+]
+
+
+def chunks(values: List, size: int) -> Iterable[List]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+async def refresh_summary(conn: AsyncConnection, model, grouping, key_column, keys: Optional[List]) -> int:
+    table = model.__table__
+    summary_key = table.c[key_column.key]
+    columns = [column.name for column in table.columns]
+
+    if keys is None:
+        await conn.execute(delete(table))
+        await conn.execute(insert(table).from_select(columns, grouping()))
+        return (await conn.execute(select(func.count()).select_from(table))).scalar_one()
+
+    for chunk in chunks(keys, KEY_CHUNK_SIZE):
+        await conn.execute(delete(table).where(summary_key.in_(chunk)))
+        await conn.execute(insert(table).from_select(columns, grouping().where(key_column.in_(chunk))))
+
+    return len(keys)
+
+
+async def refresh_summaries(
+        conn: AsyncConnection,
+        seasons: Optional[Iterable[int]] = None,
+        players: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    Recomputes the summary tables from 'Stats'.
+    With seasons/players, only the groups for those keys are rebuilt; with neither, everything is.
+    """
+    full = seasons is None and players is None
+    keys_by_column = {
+        Stats.season.key: None if full else sorted(set(seasons or [])),
+        Stats.player_name.key: None if full else sorted(set(players or [])),
+    }
+
+    for model, grouping, key_column in SUMMARIES:
+        keys = keys_by_column[key_column.key]
+        keys_refreshed = await refresh_summary(conn, model, grouping, key_column, keys)
+
+        summary = model.__tablename__
+        await conn.execute(delete(SummaryRefresh).where(SummaryRefresh.summary == summary))
+        await conn.execute(insert(SummaryRefresh).values(
+            summary=summary,
+            refreshed_at=func.now(),
+            full=full,
+            keys_refreshed=keys_refreshed,
+        ))
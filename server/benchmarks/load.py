@@ -0,0 +1,215 @@
+"""
+Load and latency benchmark for every API route.
+
+Starts the app with uvicorn in a subprocess against the database configured by the DB_* settings,
+drives each route with concurrent clients, and writes throughput and p50/p95/p99 latency as JSON.
+A stored run can be passed as --baseline to flag regressions.
+
+    python -m benchmarks.load --seed-rows 100000 --output bench.json
+    python -m benchmarks.load --baseline bench.json
+
+--seed-rows replaces ALL data in the configured database with a synthetic feed of that size.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import numpy as np
+
+SERVER_DIR = Path(__file__).parent.parent
+
+# name -> path, filters picked so every route does real work at any scale
+ROUTES = {
+    "stats": "/stats",
+    "stats_by_player": "/stats/Player1, Skater",
+    "players": "/players",
+    "player_search": "/players/search?q=player1",
+    "career": "/players/Player1, Skater/career",
+    "total_points": "/charts/total-points?season=2010",
+    "production": "/charts/production?season=2010",
+    "shooting_efficiency": "/charts/shooting-efficiency?season=2010",
+    "per_game_consistency": "/charts/per-game-consistency?players=Player1, Skater|Player2, Skater",
+    "scouting_heatmap": "/charts/scouting-heatmap",
+    "team_leaderboard": "/charts/team-leaderboard?season=2010",
+    "head_to_head": "/charts/head-to-head?players=Player1, Skater|Player2, Skater",
+    "comparison": "/charts/comparison?players=Player1, Skater|Player2, Skater|Player3, Skater",
+    "trajectory": "/charts/trajectory?players=Player1, Skater|Player2, Skater",
+    "batch": "/charts/batch?charts=total-points,production,shooting-efficiency&season=2010",
+    "export": "/export/stats?format=parquet&season=2010",
+}
+
+
+async def seed(rows: int) -> None:
+    from sqlmodel import SQLModel
+
+    from app.coordination import ensure_data_version
+    from app.db import session_manager
+    from app.ingest import ingest_csv
+    from app.migrations import upgrade
+    from benchmarks.synthetic import write_csv
+
+    await session_manager.init_db(seed=False)
+    try:
+        async with session_manager.engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.drop_all)
+            await conn.run_sync(SQLModel.metadata.create_all)
+            await ensure_data_version(conn)
+        await upgrade(session_manager.engine)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_csv(rows, Path(tmp) / 'stats.csv')
+            result = await ingest_csv(session_manager.engine, path)
+
+        print(f"seeded {result.rows} rows ({result.rows_per_second:,.0f} rows/sec)", file=sys.stderr)
+    finally:
+        await session_manager.close_db()
+
+
+def start_server(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'run:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=SERVER_DIR,
+        env={**os.environ, **env},
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get('/health/ready')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+async def drive(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    # one round to warm connections and caches before measuring
+    await asyncio.gather(*(client.get(path) for _ in range(concurrency)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99]).tolist()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(float(np.mean(latencies)) * 1000, 3),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+    }
+
+
+def compare(run: dict, baseline: dict, threshold: float) -> List[str]:
+    # A route regresses when its p95 grows, or its throughput drops, by more than threshold percent
+    regressions = []
+    for name, result in run["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if not previous:
+            continue
+
+        p95_change = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+        throughput_change = (result["throughput_rps"] - previous["throughput_rps"]) / previous["throughput_rps"] * 100
+        result["vs_baseline"] = {"p95_pct": round(p95_change, 1), "throughput_pct": round(throughput_change, 1)}
+
+        if p95_change > threshold or throughput_change < -threshold:
+            regressions.append(f"{name}: p95 {p95_change:+.1f}%, throughput {throughput_change:+.1f}%")
+
+    return regressions
+
+
+async def main(args) -> int:
+    if args.seed_rows:
+        await seed(args.seed_rows)
+
+    env = {"QUERY_CACHE_MAX_ENTRIES": "0"} if args.no_cache else {}
+    if args.engine:
+        env["STATS_ENGINE"] = args.engine
+
+    routes = {name: path for name, path in ROUTES.items() if not args.routes or name in args.routes}
+
+    server = start_server(args.port, env)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            await wait_ready(client)
+
+            results = {}
+            for name, path in routes.items():
+                results[name] = await drive(client, path, args.requests, args.concurrency)
+                print(f"{name:22} {results[name]['throughput_rps']:>9} rps  p50 {results[name]['p50_ms']:>8} ms  "
+                      f"p95 {results[name]['p95_ms']:>8} ms  p99 {results[name]['p99_ms']:>8} ms", file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait()
+
+    run = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "seed_rows": args.seed_rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+            "engine": args.engine or os.getenv("STATS_ENGINE", "sql"),
+        },
+        "routes": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        regressions = compare(run, json.loads(args.baseline.read_text()), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+
+    output = json.dumps(run, indent=2)
+    if args.output:
+        args.output.write_text(output)
+    else:
+        print(output)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-rows", type=int, default=0, help="reset the database with this many synthetic rows")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--routes", nargs="*", choices=list(ROUTES), help="only these routes")
+    parser.add_argument("--no-cache", action="store_true", help="disable the query result cache")
+    parser.add_argument("--engine", choices=["sql", "columnar"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression, in percent")
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args)))
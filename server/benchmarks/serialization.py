@@ -0,0 +1,86 @@
+"""
+Serialization benchmark for the /stats response path, no database needed.
+
+Compares the previous path (a StatsExtended model per row, FastAPI's jsonable_encoder,
+then JSONResponse rendering) with the current one (plain dicts encoded by orjson).
+
+    python -m benchmarks.serialization --rows 100000
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app.models import TEAM_MAPPING, STATS_EXTENDED_FIELDS, Stats, StatsExtended, stats_extended_row
+
+Row = namedtuple('Row', [name for name in STATS_EXTENDED_FIELDS if name != 'team_full_name'])
+
+
+def synthetic_row(i: int) -> Row:
+    gp = random.randint(1, 82)
+    return Row(
+        id=i,
+        season=random.randint(2000, 2025),
+        player_name=f"Player, {i}",
+        team=random.choice(list(TEAM_MAPPING)),
+        gp=gp,
+        toi=gp * random.randint(600, 1400),
+        toi_per_game=round(random.uniform(600, 1400), 2),
+        shots=random.randint(0, 350),
+        shots_per_game=round(random.uniform(0, 4), 2),
+        shooting_percentage=round(random.uniform(0, 25), 1),
+        goals=random.randint(0, 60),
+        goals_per_game=round(random.uniform(0, 1), 2),
+        assists=random.randint(0, 90),
+        assists_per_game=round(random.uniform(0, 1.5), 2),
+        points=random.randint(0, 150),
+        points_per_game=round(random.uniform(0, 2), 2),
+        scouting_grade=random.randint(1, 10),
+    )
+
+
+def model_path(stats):
+    models = [StatsExtended(**stat.model_dump(), team_full_name=stat.team_full_name) for stat in stats]
+    return JSONResponse(jsonable_encoder({"data": models})).body
+
+
+def fast_path(rows):
+    return ORJSONResponse({"data": [stats_extended_row(row) for row in rows]}).body
+
+
+def timed(fn, arg, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows: int, repeat: int) -> None:
+    random.seed(0)
+    data = [synthetic_row(i) for i in range(rows)]
+    stats = [Stats(**row._asdict()) for row in data]
+
+    # both paths produce the same schema
+    StatsExtended.model_validate(stats_extended_row(data[0]), strict=True)
+
+    model_seconds = timed(model_path, stats, repeat)
+    fast_seconds = timed(fast_path, data, repeat)
+
+    print(f"rows: {rows}, best of {repeat}")
+    print(f"model + jsonable_encoder: {model_seconds * 1000:8.1f} ms ({rows / model_seconds:,.0f} rows/sec)")
+    print(f"dict + orjson:            {fast_seconds * 1000:8.1f} ms ({rows / fast_seconds:,.0f} rows/sec)")
+    print(f"speedup: {model_seconds / fast_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    main(args.rows, args.repeat)
@@ -0,0 +1,66 @@
+"""
+Synthetic stats feed shaped like data/stats.csv, at any scale.
+
+Every row is a unique (season, player_name, team), players have careers of up to
+SEASONS_PER_PLAYER consecutive seasons, and the output is deterministic for a given seed.
+
+    python -m benchmarks.synthetic 100000 /tmp/stats_100k.csv
+"""
+import argparse
+import csv
+import random
+from pathlib import Path
+
+from app.models import TEAM_MAPPING
+
+FIRST_SEASON = 2000
+SEASONS_PER_PLAYER = 20
+TEAMS = list(TEAM_MAPPING)
+HEADER = ['season', 'player_name', 'team', 'gp', 'toi', 'shots', 'goals', 'assists', 'points', 'scouting_grade']
+
+
+def synthetic_rows(rows: int, seed: int = 0):
+    rng = random.Random(seed)
+
+    for i in range(rows):
+        player, career_year = divmod(i, SEASONS_PER_PLAYER)
+        # careers start in different years so every season has a spread of players
+        season = FIRST_SEASON + (player % 6) + career_year
+
+        gp = rng.randint(1, 82)
+        toi = gp * rng.randint(600, 1400)
+        shots = rng.randint(0, 4 * gp)
+        goals = rng.randint(0, shots // 6) if shots else 0
+        assists = rng.randint(0, gp)
+
+        yield [
+            season,
+            f"Player{player}, Skater",
+            TEAMS[(player + career_year // 4) % len(TEAMS)],
+            gp,
+            f"{toi // 60}:{toi % 60:02d}",
+            shots,
+            goals,
+            assists,
+            goals + assists,
+            rng.randint(1, 10),
+        ]
+
+
+def write_csv(rows: int, path: Path, seed: int = 0) -> Path:
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(HEADER)
+        writer.writerows(synthetic_rows(rows, seed))
+
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int)
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    write_csv(args.rows, args.path, args.seed)
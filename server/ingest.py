@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from app import settings
+from app.db import session_manager
+from app.ingest import DEFAULT_CSV_PATH, DeltaResult, IngestResult, apply_delta, ingest_csv, read_batches
+
+
+def report(result: IngestResult) -> None:
+    print(f"{result.rows} rows in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/sec)")
+
+
+def report_delta(result: DeltaResult) -> None:
+    print(
+        f"Version {result.version}: {result.inserted} inserted, {result.updated} updated "
+        f"across {len(result.seasons)} seasons and {len(result.players)} players in {result.seconds:.2f}s"
+    )
+
+
+async def main(path: Path, batch_size: int, delta: bool, seed: bool) -> None:
+    await session_manager.init_db(seed=False)
+    try:
+        if seed:
+            # What the server does on startup with SEED_ON_STARTUP: load the bundled CSV into an empty table
+            await session_manager.load_initial_data()
+            print("Done.")
+            return
+
+        if delta:
+            # A delta is applied as a single batch, in a single transaction
+            columns = next(read_batches(path, sys.maxsize), None)
+            if columns is None:
+                print("The delta has no rows.")
+                return
+            report_delta(await apply_delta(session_manager.engine, columns, source=f"cli:{path.name}"))
+            return
+
+        result = await ingest_csv(session_manager.engine, path, batch_size, on_batch=report)
+        print("Done.")
+        report(result)
+    finally:
+        await session_manager.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load a stats CSV, upserting on (season, player_name, team).")
+    parser.add_argument("path", nargs="?", type=Path, default=DEFAULT_CSV_PATH)
+    parser.add_argument("--batch-size", type=int, default=settings.INGEST_BATCH_SIZE)
+    parser.add_argument(
+        "--delta",
+        action="store_true",
+        help="Apply the file as one delta: a single transaction with a change log entry, "
+             "invalidating only the affected seasons and players.",
+    )
+    parser.add_argument(
+        "--seed",
+        action="store_true",
+        help="Load the bundled CSV only if the stats table is empty, as the server does on startup "
+             "unless SEED_ON_STARTUP is off.",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.path, args.batch_size, args.delta, args.seed))
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import sys
+
+from app.db import session_manager
+from app.migrations import MIGRATIONS, applied_revisions, remove_duplicate_rows, upgrade
+from app.query_plans import check_plans
+
+
+async def dedupe() -> int:
+    # Before init_db, whose migrations refuse to run while duplicates exist
+    session_manager.connect()
+    try:
+        removed, keys = await remove_duplicate_rows(session_manager.engine)
+    finally:
+        await session_manager.close_db()
+
+    for season, player_name, team, rows in keys:
+        print(f"{season} {player_name} {team}: kept the newest of {rows} rows")
+    print(f"Removed {removed} duplicate rows.")
+    return 0
+
+
+async def main(command: str) -> int:
+    if command == 'dedupe':
+        return await dedupe()
+
+    # init_db applies pending migrations itself, under the startup lock
+    await session_manager.init_db(seed=False)
+    engine = session_manager.engine
+    try:
+        if command == 'upgrade':
+            await upgrade(engine)
+            print(f"Schema is at revision {(await applied_revisions(engine))[-1]}.")
+            return 0
+
+        if command == 'current':
+            applied = set(await applied_revisions(engine))
+            for migration in MIGRATIONS:
+                print(f"{migration.revision} {'applied' if migration.revision in applied else 'pending':8} {migration.description}")
+            return 0
+
+        if engine.dialect.name != 'postgresql':
+            print("The plan check needs the postgres backend, the expected indexes are Postgres plans.")
+            return 0
+
+        failures = 0
+        for result in await check_plans(engine):
+            status = 'ok' if result.ok else 'FAIL'
+            failures += not result.ok
+            print(f"{status:4} {result.name}: expected {result.index}, used {result.indexes_used or 'no index'}, {result.sorts} sorts")
+        return 1 if failures else 0
+    finally:
+        await session_manager.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schema migrations and the query plan check.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="upgrade",
+        choices=["upgrade", "current", "check", "dedupe"],
+        help="upgrade: apply pending migrations; current: list revisions; "
+             "check: EXPLAIN the chart queries and fail if one no longer uses its index; "
+             "dedupe: delete all but the newest row of each (season, player_name, team), which the upgrade requires",
+    )
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(main(args.command)))
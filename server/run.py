@@ -1,22 +1,91 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import List
 
 import uvicorn
+from brotli_asgi import BrotliMiddleware
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 
 from app import settings
-from app.router import router
+from app.middleware import ConditionalGetMiddleware
+from app.profiling import ProfilingMiddleware, instrument_engine
+from app.router import BATCH_CHARTS, jobs_router, router
+from app.coordination import PREWARM_LOCK, advisory_lock, poll_data_version
 from app.db import session_manager
+from app.engine import columnar_store
+from app.jobs import JOBS_ENABLED, job_queue
+from app.live import live_hub
+from app.startup import prewarm_charts, startup_state
+
+
+async def start(background: List[asyncio.Task]) -> None:
+    startup_state.enter('database')
+    await session_manager.init_db(seed=settings.SEED_ON_STARTUP)
+
+    if settings.PROFILING_ENABLED:
+        for engine in {session_manager.engine, session_manager.read_engine}:
+            instrument_engine(engine)
+
+    if settings.STATS_ENGINE == 'columnar':
+        startup_state.enter('columnar')
+        async with session_manager.read_session_factory() as session:
+            await columnar_store.ensure_loaded(session)
+
+    background.append(asyncio.create_task(poll_data_version(session_manager.read_engine, settings.DATA_VERSION_POLL_SECONDS)))
+    background.append(asyncio.create_task(live_hub.run()))
+
+    # The columnar engine answers the charts from memory without the query cache, nothing to warm.
+    # The query cache is per worker, so rather than every worker running the same queries, one warms its own
+    if settings.CACHE_PREWARM and settings.STATS_ENGINE != 'columnar':
+        async with advisory_lock(session_manager.engine, PREWARM_LOCK, blocking=False) as acquired:
+            if acquired:
+                startup_state.enter('prewarm')
+                await prewarm_charts(BATCH_CHARTS)
+
+    startup_state.enter('ready')
+
+
+async def start_in_background(background: List[asyncio.Task]) -> None:
+    # Fast start: the probes answer meanwhile, a failure shows on them instead of stopping the process
+    try:
+        await start(background)
+    except Exception as e:
+        startup_state.fail(e)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await session_manager.init_db()
+    background: List[asyncio.Task] = []
+
+    if settings.FAST_START:
+        background.append(asyncio.create_task(start_in_background(background)))
+    else:
+        await start(background)
+
     yield
+
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await job_queue.close()
     await session_manager.close_db()
 
 app = FastAPI(lifespan=lifespan)
 
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+app.add_middleware(ConditionalGetMiddleware)
+
+if settings.COMPRESSION == 'br':
+    # falls back to gzip for clients that don't accept brotli
+    app.add_middleware(BrotliMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+elif settings.COMPRESSION == 'gzip':
+    app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[settings.WEB_APP_URL],
@@ -26,8 +95,14 @@ app.add_middleware(
 )
 
 app.include_router(router)
+if JOBS_ENABLED:
+    app.include_router(jobs_router)
 
 
 if __name__ == "__main__":
-    uvicorn.run(app="run:app", host="0.0.0.0", port=8000, reload=True)
+    if settings.SERVER_WORKERS > 1:
+        # Production: one process per worker, startup is coordinated through the database
+        uvicorn.run(app="run:app", host="0.0.0.0", port=8000, workers=settings.SERVER_WORKERS)
+    else:
+        uvicorn.run(app="run:app", host="0.0.0.0", port=8000, reload=settings.SERVER_RELOAD)
 